@@ -0,0 +1,243 @@
+# api.py — API HTTP (ASGI puro, sin framework) con los cálculos de clinical_calc / exporters.
+#
+#   python api.py --port 8080            # uvicorn si está instalado; si no, servidor asyncio incluido
+#   uvicorn api:app --port 8080
+#
+#   POST /bmr /tee /macros /exchanges /calc          un paciente → JSON
+#   POST /fhir/NutritionOrder /fhir/NutritionIntake   payload de exporters → recurso FHIR
+#   POST /batch[?equation=harris&ade_on=1]            lista JSON o NDJSON de pacientes → NDJSON en streaming
+#                                                     (si un bloque falla, la última línea es {"error", "rows_sent"})
+#   GET  /health /metrics                             estado y métricas (formato Prometheus)
+import argparse
+import asyncio
+import json
+import sys
+import time
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+
+import pandas as pd
+
+import clinical_batch as cb
+import clinical_calc as cc
+from exchanges_catalog import distribute_by_meal, exchanges_from_kcal
+from exporters import fhir_nutrition_intake, fhir_nutrition_order
+from perf import Recorder
+
+try:
+    import orjson
+    _dumps, _loads = orjson.dumps, orjson.loads
+except Exception:
+    _dumps = lambda obj, _enc=json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode: _enc(obj).encode("utf-8")
+    _loads = json.loads
+
+BATCH_CHUNK = 2000   # filas por bloque de /batch (cada bloque se envía en cuanto está listo)
+# Errores de datos del cliente → 400 (p. ej. "sex": 1 → AttributeError en .lower())
+BAD_INPUT = (KeyError, ValueError, TypeError, AttributeError, ZeroDivisionError)
+
+# Métricas por ruta (siempre activas, independientes de NUTRI_PERF; sin JSONL ni archivo)
+METRICS = Recorder(log_path=None, prom_path=None)
+
+# ---------- cálculos de un paciente ----------
+def _factor(activity):
+    if isinstance(activity, (int, float)): return float(activity)
+    return cc.ACTIVITY.get(activity, cc.PAL.get(activity, 1.2))
+
+def _bmr(p):
+    eq = cc.harris_benedict if str(p.get("equation", "mifflin")).lower().startswith("harris") else cc.mifflin_st_jeor
+    return eq(p["sex"], float(p["weight_kg"]), float(p["height_cm"]), float(p["age"]))
+
+def _tee(p):
+    bmr = _bmr(p)
+    return bmr, cc.tee_ambulatorio(bmr, _factor(p.get("activity", "Reposo")), bool(p.get("ade_on", False)))
+
+def _macros(p, kcal):
+    pp, pf = p.get("pct_prot", 20), p.get("pct_fat", 30)
+    return cc.macros(kcal, pp, pf, p.get("pct_cho", 100 - pp - pf), float(p.get("weight_kg") or 0),
+                     p.get("pct_cho_complex", 85), tuple(p.get("fat_split", (10, 35, 55))))
+
+def _exchanges(kcal, mac):
+    daily = exchanges_from_kcal(kcal, mac["pct"]["prot"], mac["pct"]["fat"])
+    return {"daily": daily, "by_meal": distribute_by_meal(daily)}
+
+def calc(p):
+    """Paciente (sex, age, weight_kg, height_cm, activity, objective, equation, ade_on, pct_*) → todo el cálculo."""
+    bmr, tee = _tee(p)
+    kcal = cc.kcal_target(tee, p.get("objective", "Mantenimiento"))
+    mac = _macros(p, kcal)
+    return {"bmr": round(bmr, 1), "tee": tee, "kcal": kcal, "bmi": cc.bmi(float(p["weight_kg"]), float(p["height_cm"])),
+            "macros": mac, "exchanges": _exchanges(kcal, mac)}
+
+def _batch_rows(df, equation, ade_on):
+    # Mismo cálculo vectorizado que batch_plans (requerimientos + intercambios + reparto por comida)
+    from batch_plans import plan_chunk
+    out = plan_chunk(df, equation, ade_on)
+    out["bmr"] = cb._round(out["bmr"].to_numpy(), 1)   # como /calc y /bmr: round(bmr, 1)
+    return out.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8")
+
+ROUTES = {
+    ("POST", "/bmr"): lambda p: {"bmr": round(_bmr(p), 1)},
+    ("POST", "/tee"): lambda p: dict(zip(("bmr", "tee"), (lambda b, t: (round(b, 1), t))(*_tee(p)))),
+    ("POST", "/macros"): lambda p: _macros(p, float(p["kcal"])),
+    ("POST", "/exchanges"): lambda p: (lambda d: {"daily": d, "by_meal": distribute_by_meal(d)})(
+        exchanges_from_kcal(float(p["kcal"]), p.get("pct_prot", 20), p.get("pct_fat", 30))),
+    ("POST", "/calc"): calc,
+    ("POST", "/fhir/NutritionOrder"): fhir_nutrition_order,
+    ("POST", "/fhir/NutritionIntake"): fhir_nutrition_intake,
+    ("GET", "/health"): lambda p: {"status": "ok"},
+}
+
+# ---------- ASGI ----------
+async def _read_body(receive):
+    chunks = []
+    while True:
+        msg = await receive()
+        chunks.append(msg.get("body", b""))
+        if not msg.get("more_body"): return b"".join(chunks)
+
+async def _respond(send, status, body, ctype=b"application/json"):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", ctype), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+def _object(body):
+    p = _loads(body) if body else {}
+    if not isinstance(p, dict): raise TypeError("el cuerpo debe ser un objeto JSON")
+    return p
+
+def _patients(body):
+    # Lista JSON, {"patients": [...]} o NDJSON; cada paciente debe ser un objeto
+    body = body.strip()
+    if body[:1] == b"[": out = _loads(body)
+    elif body[:1] == b"{" and b"\n" not in body: out = _loads(body)["patients"]
+    else: out = [_loads(line) for line in body.splitlines() if line.strip()]
+    if not isinstance(out, list) or not all(isinstance(p, dict) for p in out):
+        raise TypeError("se esperaba una lista de objetos JSON (paciente)")
+    return out
+
+async def _batch(scope, receive, send):
+    # ?equation=harris&ade_on=1 se aplican a todo el lote
+    q = dict(parse_qsl(scope.get("query_string", b"").decode()))
+    equation, ade_on = q.get("equation", "mifflin"), q.get("ade_on", "0") not in ("0", "", "false")
+    loop = asyncio.get_running_loop()
+    # Columnas (con alias) y primer bloque se resuelven antes de la cabecera: sus errores todavía son un 400.
+    # Cada bloque se calcula en un hilo para no bloquear las llamadas individuales.
+    try:
+        df = pd.DataFrame(_patients(await _read_body(receive)))
+        for name in ("sex", "age", "weight_kg", "height_cm"): cb._col(df, name)
+        body = await loop.run_in_executor(None, _batch_rows, df.iloc[:BATCH_CHUNK], equation, ade_on) if len(df) else b""
+    except BAD_INPUT as e:
+        await _respond(send, 400, _dumps({"error": f"{type(e).__name__}: {e}"})); return 400
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+    status = 200
+    try:
+        for i in range(BATCH_CHUNK, len(df) + BATCH_CHUNK, BATCH_CHUNK):
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+            body = await loop.run_in_executor(None, _batch_rows, df.iloc[i:i+BATCH_CHUNK], equation, ade_on) if i < len(df) else b""
+    except Exception as e:
+        # La cabecera ya salió: la última línea es un registro de error explícito (el cliente distingue un
+        # resultado truncado de uno completo) y la petición cuenta como error en /metrics
+        status = 500
+        await send({"type": "http.response.body", "more_body": True,
+                    "body": _dumps({"error": f"{type(e).__name__}: {e}", "rows_sent": i}) + b"\n"})
+    await send({"type": "http.response.body", "body": b""})
+    return status
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while (await receive())["type"] != "lifespan.shutdown": await send({"type": "lifespan.startup.complete"})
+        await send({"type": "lifespan.shutdown.complete"}); return
+    if scope["type"] != "http": return
+    t0 = time.perf_counter()
+    method, path = scope["method"], scope["path"]
+    status, started = 200, [False]
+    async def send_(msg, _send=send):
+        started[0] = True; await _send(msg)
+    send = send_
+    try:
+        if path == "/metrics":
+            await _respond(send, 200, METRICS.prometheus("nutri_http_request", "route").encode(), b"text/plain; version=0.0.4")
+        elif path == "/batch":
+            if method != "POST": status = 405; await _respond(send, 405, b'{"error":"usar POST"}')
+            else: status = await _batch(scope, receive, send)
+        else:
+            fn = ROUTES.get((method, path))
+            if fn is None:
+                status = 405 if any(p == path for _, p in ROUTES) else 404
+                await _respond(send, status, _dumps({"error": f"{method} {path} no existe"}))
+            else:
+                body = await _read_body(receive) if method == "POST" else b""
+                try:
+                    out = _dumps(fn(_object(body)))
+                except BAD_INPUT as e:
+                    status = 400; out = _dumps({"error": f"{type(e).__name__}: {e}"})
+                await _respond(send, status, out)
+    except Exception as e:
+        # Fallo inesperado: 500 si la respuesta no empezó (la conexión no se corta sin respuesta)
+        status = 500
+        if not started[0]: await _respond(send, 500, _dumps({"error": f"{type(e).__name__}: {e}"}))
+    finally:
+        METRICS.record(path if (method, path) in ROUTES or path in ("/batch", "/metrics") else "other",
+                       time.perf_counter() - t0, status >= 400)
+
+# ---------- servidor HTTP/1.1 mínimo (sin dependencias) ----------
+async def _handle(reader, writer):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line: break
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+            headers = []
+            while (h := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                k, v = h.decode("latin-1").split(":", 1); headers.append((k.strip().lower().encode(), v.strip().encode()))
+            hd = dict(headers)
+            body = await reader.readexactly(int(hd.get(b"content-length", b"0")))
+            path, _, query = target.partition("?")
+            scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+                     "path": path, "query_string": query.encode(), "headers": headers, "scheme": "http"}
+            sent = [False]
+            async def receive():
+                if sent[0]: return {"type": "http.disconnect"}
+                sent[0] = True; return {"type": "http.request", "body": body, "more_body": False}
+            chunked = [False]
+            async def send(msg):
+                if msg["type"] == "http.response.start":
+                    hs = dict(msg.get("headers", []))
+                    chunked[0] = b"content-length" not in hs
+                    head = [f"HTTP/1.1 {msg['status']} {HTTPStatus(msg['status']).phrase}"] + [f"{k.decode()}: {v.decode()}" for k, v in hs.items()]
+                    if chunked[0]: head.append("transfer-encoding: chunked")
+                    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+                else:
+                    b = msg.get("body", b"")
+                    if chunked[0]:
+                        if b: writer.write(b"%x\r\n%b\r\n" % (len(b), b))
+                        if not msg.get("more_body"): writer.write(b"0\r\n\r\n")
+                    else:
+                        writer.write(b)
+                    await writer.drain()
+            await app(scope, receive, send)
+            if hd.get(b"connection", b"").lower() == b"close": break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def _serve(host, port):
+    server = await asyncio.start_server(_handle, host, port)
+    print(f"API en http://{host}:{port}", file=sys.stderr)
+    async with server: await server.serve_forever()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="API de cálculo nutricional (ASGI).")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    a = ap.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        asyncio.run(_serve(a.host, a.port))
+    else:
+        uvicorn.run(app, host=a.host, port=a.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
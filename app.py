@@ -1,17 +1,21 @@
 # app.py — @nutritionsays · Gestión Nutricional (ambulatorio, cálculo en vivo)
 from datetime import date
-from io import BytesIO
-import math
+import hashlib
+import json
+import os
 import streamlit as st
-import pandas as pd
 
-# DOCX opcional
-try:
-    from docx import Document
-    from docx.shared import Pt
-    DOCX = True
-except Exception:
-    DOCX = False
+# Arranque en frío: aquí solo módulos livianos (catálogos compartidos, una vez por proceso). pandas, numpy,
+# python-docx, food_db, lab_rules y monitoring se importan en la sección que los usa, así la cabecera y el
+# sidebar se pintan antes de cargarlos. Desglose medido: python startup_report.py
+from calc_graph import CalcGraph
+from clinical_calc import (PAL, bmi, dw_density, harris_benedict, kcal_target, macros, mifflin_st_jeor,
+                           siri_pctfat, tee_ambulatorio, whr, whtr)
+from exchanges_catalog import EXCHANGES, exchanges_from_kcal, distribute_by_meal
+from exporters import DOCX, build_docx_plan_simple  # DOCX opcional (plantilla compilada)
+from store import NutriStore
+from jobs import JobQueue, DONE, ERROR
+import perf
 
 BRAND = "@nutritionsays"
 st.set_page_config(
@@ -21,6 +25,9 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Tiempos por sección de cada rerun (perf.py; sin NUTRI_PERF no hace nada)
+_sec = perf.sections("app")
+
 # =================== CSS + botón flotante reabrir sidebar ===================
 st.markdown("""
 <style>
@@ -118,84 +125,57 @@ btn.onclick = ()=>{
 """, unsafe_allow_html=True)
 
 st.markdown(f"### {BRAND} · Software de Gestión Nutricional")
-
-# =================== Catálogos y utilidades ===================
-EXCHANGES = {
-    "Vegetales": {"kcal":25,"CHO":5,"PRO":2,"FAT":0,"portion":"1 taza crudas / 1/2 taza cocidas"},
-    "Frutas": {"kcal":60,"CHO":15,"PRO":0,"FAT":0,"portion":"1 unid pequeña / 1/2 taza picada"},
-    "Cereales": {"kcal":80,"CHO":15,"PRO":2,"FAT":1,"portion":"1/2 taza cocidos / 1 rebanada pan"},
-    "Leguminosas": {"kcal":100,"CHO":18,"PRO":7,"FAT":1,"portion":"1/2 taza cocidas"},
-    "Lácteos descremados": {"kcal":90,"CHO":12,"PRO":8,"FAT":2,"portion":"1 taza leche / yogurt natural"},
-    "Proteínas magras": {"kcal":110,"CHO":0,"PRO":21,"FAT":3,"portion":"30 g cocidos"},
-    "Grasas saludables": {"kcal":45,"CHO":0,"PRO":0,"FAT":5,"portion":"1 cdita (5 g)"}
-}
-PAL = {"Muy bajo (sedentario)":1.2, "Ligero":1.4, "Moderado":1.6, "Alto":1.75, "Muy alto":2.0}
-
-def mifflin(sex, w, h_cm, age): return 10*w + 6.25*h_cm - 5*age + (5 if sex.lower().startswith("m") else -161)
-def harris_benedict(sex, w, h_cm, age):
-    if sex.lower().startswith("m"): return 66.47 + (13.75*w) + (5.003*h_cm) - (6.755*age)
-    return 655.09 + (9.563*w) + (1.850*h_cm) - (4.676*age)
-def tee_ambulatorio(mb, pal, ade_on=False):
-    base = mb * pal
-    if ade_on: base *= 1.10
-    return round(base)
-def kcal_target(tee, obj):
-    if obj=="Pérdida de peso": return max(1000, tee - (400 if tee>=1600 else 200))
-    if obj=="Ganancia (magro)": return tee + 200
-    return tee
-def bmi(w,hcm):
-    if not w or not hcm: return None
-    h=max(1e-6, hcm/100); return round(w/(h*h),2)
-def whr(waist, hip): return round((waist/hip),2) if waist and hip else None
-def whtr(waist, hcm): return round((waist/hcm),2) if waist and hcm else None
-DW = {
-    "F":[(17,(1.1549,0.0678)),(29,(1.1599,0.0717)),(39,(1.1423,0.0632)),(49,(1.1333,0.0612)),(120,(1.1339,0.0645))],
-    "M":[(17,(1.1620,0.0630)),(29,(1.1631,0.0632)),(39,(1.1422,0.0544)),(49,(1.1620,0.0700)),(120,(1.1715,0.0779))]
-}
-def dw_density(sex, age, biceps, triceps, subesc, supra):
-    S=max(0.1,(biceps or 0)+(triceps or 0)+(subesc or 0)+(supra or 0)); logS=math.log10(S)
-    key="F" if sex.lower().startswith("f") else "M"
-    coeff=None
-    for up,ab in DW[key]:
-        if age<=up: coeff=ab; break
-    if coeff is None: coeff=DW[key][-1][1]
-    a,b=coeff; return a-(b*logS)
-def siri_pctfat(d): return round(((4.95/d)-4.50)*100,1)
-def macros(kcal, pct_prot, pct_fat, pct_cho, w, pct_cho_complex=85, fat_split=(10,35,55)):
-    kcal=max(0,int(kcal or 0))
-    total=max(1,int(pct_prot)+int(pct_fat)+int(pct_cho))
-    pct_prot=round(100*int(pct_prot)/total); pct_fat=round(100*int(pct_fat)/total); pct_cho=100-pct_prot-pct_fat
-    g_prot=round((kcal*pct_prot/100)/4,1); g_fat=round((kcal*pct_fat/100)/9,1); g_cho=round((kcal*pct_cho)/4,1)
-    gkg_prot=round(g_prot/(w or 1),2)
-    g_cho_c=round(g_cho*(pct_cho_complex or 0)/100,1); g_cho_s=round(g_cho-g_cho_c,1)
-    sat,poli,mono=fat_split; subtotal=max(1,int(sat)+int(poli)+int(mono))
-    sat=pct_fat*int(sat)/subtotal; poli=pct_fat*int(poli)/subtotal; mono=pct_fat-sat-poli
-    g_sat=round((kcal*sat/100)/9,1); g_poli=round((kcal*poli/100)/9,1); g_mono=round((kcal*mono/100)/9,1)
-    return {"pct":{"prot":pct_prot,"fat":pct_fat,"cho":100-pct_prot-pct_fat},
-            "g":{"prot":g_prot,"fat":g_fat,"cho":g_cho,"cho_c":g_cho_c,"cho_s":g_cho_s,"sat":g_sat,"poli":g_poli,"mono":g_mono},
-            "gkg":{"prot":gkg_prot}}
-
-def exchanges_from_kcal(k):
-    if not k or k<=0: return {g:0 for g in EXCHANGES}
-    f=max(1.0, min(2.4, k/2000))
-    base={"Vegetales":4,"Frutas":2,"Cereales":5,"Leguminosas":1,"Lácteos descremados":1,"Proteínas magras":4,"Grasas saludables":4}
-    return {g:int(round(v*f)) for g,v in base.items()}
-def distribute_by_meal(d):
-    split={"Desayuno":0.25,"Merienda AM":0.10,"Almuerzo":0.30,"Merienda PM":0.10,"Cena":0.25}
-    out={m:{} for m in split}
-    for g,tot in d.items():
-        for m,fr in split.items(): out[m][g]=round(tot*fr,1)
-    return out
+_sec("css")
 
 # =================== Sidebar ===================
+def form_from_record(rec):
+    # Registro de schema_nutri.json → valores iniciales del formulario lateral
+    p, a = rec["patient"], rec.get("assessment", {})
+    an, bc = a.get("anthropometrics", {}), a.get("biochem", {})
+    sk, lip = an.get("skinfolds", {}), bc.get("lipids", {})
+    ren, hep, fe = bc.get("renal", {}), bc.get("hepatic", {}), bc.get("iron", {})
+    return {k: v for k, v in {
+        "nombre": p.get("name"), "sexo": p.get("sex_at_birth"), "edad": rec.get("encounter", {}).get("age_y"),
+        "talla_cm": an.get("height_cm"), "peso": an.get("weight_kg"), "cintura": an.get("waist_cm"), "cadera": an.get("hip_cm"),
+        "muac": an.get("muac_cm"), "p_bi": sk.get("biceps"), "p_tri": sk.get("triceps"), "p_sub": sk.get("subscapular"),
+        "p_sup": sk.get("suprailiac"), "bia_fat": an.get("body_comp", {}).get("fat_pct"),
+        "glicemia": bc.get("glucose_mg_dl"), "insulina": bc.get("insulin_uU_ml"), "hba1c": bc.get("hba1c_pct"),
+        "tc": lip.get("tc"), "hdl": lip.get("hdl"), "ldl": lip.get("ldl"), "tg": lip.get("tg"),
+        "creat": ren.get("creat"), "uacr": ren.get("uacr"), "alt": hep.get("alt"), "ast": hep.get("ast"),
+        "hb": fe.get("hb"), "ferritin": fe.get("ferritin"),
+    }.items() if v is not None}
+
+def _prev(prev, key, default, lo, hi):
+    # Valor inicial acotado a los límites del widget (un registro fuera de rango haría fallar number_input)
+    return type(lo)(min(hi, max(lo, prev.get(key, default))))
+
+@st.cache_resource
+def get_store(): return NutriStore()
+
+@st.cache_resource
+def get_monitoring():
+    from monitoring import MonitoringStore
+    return MonitoringStore()
+
+# Cola de exportación única para todo el servidor: pool de un proceso por núcleo; como mucho 64 DOCX
+# terminados en memoria (los más antiguos se descartan) y ninguno más de 15 min
+@st.cache_resource
+def get_jobs(): return JobQueue(ttl=900, max_entries=64)
+
 with st.sidebar:
     st.subheader("Paciente")
     st.selectbox("Modo", ["Ambulatorio (recomendado)"])
-    nombre = st.text_input("Nombre y apellido", "")
-    sexo = st.selectbox("Sexo biológico", ["Femenino","Masculino"])
-    edad = st.number_input("Edad (años)", 1, 120, 30, step=1)
-    talla_cm = st.number_input("Talla (cm)", 120, 230, 165)
-    peso = st.number_input("Peso (kg)", 30.0, 300.0, 70.0, step=0.1)
+    paciente_id = st.text_input("ID paciente", "", help="Para guardar la consulta y recuperar la anterior")
+    if paciente_id and st.button("↩️ Cargar última consulta"):
+        rec = get_store().latest_encounter(paciente_id)
+        if rec: st.session_state["prev_form"] = form_from_record(rec)
+        else: st.warning("Sin consultas previas para ese ID")
+    prev = st.session_state.get("prev_form", {})
+    nombre = st.text_input("Nombre y apellido", prev.get("nombre", ""))
+    sexo = st.selectbox("Sexo biológico", ["Femenino","Masculino"], index=1 if prev.get("sexo")=="Masculino" else 0)
+    edad = st.number_input("Edad (años)", 1, 120, _prev(prev, "edad", 30, 1, 120), step=1)
+    talla_cm = st.number_input("Talla (cm)", 120, 230, _prev(prev, "talla_cm", 165, 120, 230))
+    peso = st.number_input("Peso (kg)", 30.0, 300.0, _prev(prev, "peso", 70.0, 30.0, 300.0), step=0.1)
 
     st.caption("Ecuación y PAL")
     eq = st.selectbox("Ecuación de MB", ["Mifflin–St Jeor","Harris–Benedict"])
@@ -204,37 +184,65 @@ with st.sidebar:
     objetivo = st.selectbox("Objetivo", ["Pérdida de peso","Mantenimiento","Ganancia (magro)"], index=1)
 
     with st.expander("Antropometría (opcional)"):
-        cintura = st.number_input("Cintura (cm)", 0.0, 300.0, 0.0, step=0.1)
-        cadera  = st.number_input("Cadera (cm)", 0.0, 300.0, 0.0, step=0.1)
-        muac    = st.number_input("CB/MUAC (cm)", 0.0, 80.0, 0.0, step=0.1)
-        p_bi = st.number_input("Bíceps (mm)", 0.0, 60.0, 0.0, step=0.5)
-        p_tri = st.number_input("Tríceps (mm)", 0.0, 60.0, 0.0, step=0.5)
-        p_sub = st.number_input("Subescapular (mm)", 0.0, 60.0, 0.0, step=0.5)
-        p_sup = st.number_input("Suprailiaco (mm)", 0.0, 60.0, 0.0, step=0.5)
-        bia_fat = st.number_input("% Grasa (BIA)", 0.0, 70.0, 0.0, step=0.1)
+        cintura = st.number_input("Cintura (cm)", 0.0, 300.0, _prev(prev, "cintura", 0.0, 0.0, 300.0), step=0.1)
+        cadera  = st.number_input("Cadera (cm)", 0.0, 300.0, _prev(prev, "cadera", 0.0, 0.0, 300.0), step=0.1)
+        muac    = st.number_input("CB/MUAC (cm)", 0.0, 80.0, _prev(prev, "muac", 0.0, 0.0, 80.0), step=0.1)
+        p_bi = st.number_input("Bíceps (mm)", 0.0, 60.0, _prev(prev, "p_bi", 0.0, 0.0, 60.0), step=0.5)
+        p_tri = st.number_input("Tríceps (mm)", 0.0, 60.0, _prev(prev, "p_tri", 0.0, 0.0, 60.0), step=0.5)
+        p_sub = st.number_input("Subescapular (mm)", 0.0, 60.0, _prev(prev, "p_sub", 0.0, 0.0, 60.0), step=0.5)
+        p_sup = st.number_input("Suprailiaco (mm)", 0.0, 60.0, _prev(prev, "p_sup", 0.0, 0.0, 60.0), step=0.5)
+        bia_fat = st.number_input("% Grasa (BIA)", 0.0, 70.0, _prev(prev, "bia_fat", 0.0, 0.0, 70.0), step=0.1)
 
     with st.expander("Laboratorios (opcional)"):
-        glicemia = st.number_input("Glucosa (mg/dL)", 0.0, 800.0, 0.0, step=0.1)
-        insulina = st.number_input("Insulina (µUI/mL)", 0.0, 1000.0, 0.0, step=0.1)
-        hba1c = st.number_input("HbA1c (%)", 0.0, 20.0, 0.0, step=0.1)
-        tc  = st.number_input("Colesterol total (mg/dL)", 0.0, 500.0, 0.0, step=0.1)
-        hdl = st.number_input("HDL (mg/dL)", 0.0, 200.0, 0.0, step=0.1)
-        ldl = st.number_input("LDL (mg/dL)", 0.0, 300.0, 0.0, step=0.1)
-        tg  = st.number_input("Triglicéridos (mg/dL)", 0.0, 1000.0, 0.0, step=0.1)
-
-# =================== Cálculos ===================
-mb = mifflin(sexo, peso, talla_cm, edad) if eq.startswith("Mifflin") else harris_benedict(sexo, peso, talla_cm, edad)
-tee = tee_ambulatorio(mb, PAL[pal_key], ade_on)
-kcal = kcal_target(tee, objetivo)
-
-imc = bmi(peso, talla_cm)
-icc = whr(cintura, cadera)
-ict = whtr(cintura, talla_cm)
-
-pct_grasa_dw=None
-if sum([p_bi, p_tri, p_sub, p_sup])>0:
-    dens = dw_density(sexo, edad, p_bi, p_tri, p_sub, p_sup)
-    pct_grasa_dw = siri_pctfat(dens)
+        glicemia = st.number_input("Glucosa (mg/dL)", 0.0, 800.0, _prev(prev, "glicemia", 0.0, 0.0, 800.0), step=0.1)
+        insulina = st.number_input("Insulina (µUI/mL)", 0.0, 1000.0, _prev(prev, "insulina", 0.0, 0.0, 1000.0), step=0.1)
+        hba1c = st.number_input("HbA1c (%)", 0.0, 20.0, _prev(prev, "hba1c", 0.0, 0.0, 20.0), step=0.1)
+        tc  = st.number_input("Colesterol total (mg/dL)", 0.0, 500.0, _prev(prev, "tc", 0.0, 0.0, 500.0), step=0.1)
+        hdl = st.number_input("HDL (mg/dL)", 0.0, 200.0, _prev(prev, "hdl", 0.0, 0.0, 200.0), step=0.1)
+        ldl = st.number_input("LDL (mg/dL)", 0.0, 300.0, _prev(prev, "ldl", 0.0, 0.0, 300.0), step=0.1)
+        tg  = st.number_input("Triglicéridos (mg/dL)", 0.0, 1000.0, _prev(prev, "tg", 0.0, 0.0, 1000.0), step=0.1)
+        creat = st.number_input("Creatinina (mg/dL)", 0.0, 20.0, _prev(prev, "creat", 0.0, 0.0, 20.0), step=0.01)
+        uacr = st.number_input("Albúmina/creatinina orina (mg/g)", 0.0, 5000.0, _prev(prev, "uacr", 0.0, 0.0, 5000.0), step=0.1)
+        alt = st.number_input("ALT/TGP (U/L)", 0.0, 2000.0, _prev(prev, "alt", 0.0, 0.0, 2000.0), step=1.0)
+        ast = st.number_input("AST/TGO (U/L)", 0.0, 2000.0, _prev(prev, "ast", 0.0, 0.0, 2000.0), step=1.0)
+        hb = st.number_input("Hemoglobina (g/dL)", 0.0, 25.0, _prev(prev, "hb", 0.0, 0.0, 25.0), step=0.1)
+        ferritin = st.number_input("Ferritina (ng/mL)", 0.0, 5000.0, _prev(prev, "ferritin", 0.0, 0.0, 5000.0), step=0.1)
+
+_sec("sidebar")
+
+# =================== Cálculos (grafo reactivo) ===================
+import pandas as pd   # primer uso: tablas del plan
+# Cada nodo se recalcula solo si cambió alguna de sus entradas; resultados guardados por sesión
+def _pct_grasa_dw(sexo, edad, p_bi, p_tri, p_sub, p_sup):
+    if sum([p_bi, p_tri, p_sub, p_sup])>0: return siri_pctfat(dw_density(sexo, edad, p_bi, p_tri, p_sub, p_sup))
+    return None
+def _df_plan(diario):
+    return pd.DataFrame({
+        "Grupo": list(diario.keys()),
+        "Raciones/día": list(diario.values()),
+        "kcal/rac": [EXCHANGES[g]["kcal"] for g in diario.keys()],
+        "CHO": [EXCHANGES[g]["CHO"] for g in diario.keys()],
+        "PRO": [EXCHANGES[g]["PRO"] for g in diario.keys()],
+        "FAT": [EXCHANGES[g]["FAT"] for g in diario.keys()],
+        "Porción": [EXCHANGES[g]["portion"] for g in diario.keys()]
+    })
+
+calc = (CalcGraph()
+    .add("mb", lambda eq, sexo, peso, talla_cm, edad: mifflin_st_jeor(sexo, peso, talla_cm, edad) if eq.startswith("Mifflin") else harris_benedict(sexo, peso, talla_cm, edad),
+         "eq", "sexo", "peso", "talla_cm", "edad")
+    .add("tee", lambda mb, pal_key, ade_on: tee_ambulatorio(mb, PAL[pal_key], ade_on), "mb", "pal_key", "ade_on")
+    .add("kcal", kcal_target, "tee", "objetivo")
+    .add("imc", bmi, "peso", "talla_cm")
+    .add("icc", whr, "cintura", "cadera")
+    .add("ict", whtr, "cintura", "talla_cm")
+    .add("pct_grasa_dw", _pct_grasa_dw, "sexo", "edad", "p_bi", "p_tri", "p_sub", "p_sup")
+    .add("mac", lambda kcal, pct_prot, pct_fat, peso, pct_cho_complex, sat, poli:
+         macros(kcal, pct_prot, pct_fat, 100-pct_prot-pct_fat, peso, pct_cho_complex, fat_split=(sat, poli, max(0,100-sat-poli))),
+         "kcal", "pct_prot", "pct_fat", "peso", "pct_cho_complex", "sat", "poli")
+    .add("diario", exchanges_from_kcal, "kcal", "pct_prot", "pct_fat")
+    .add("por_comida", distribute_by_meal, "diario")
+    .add("df_plan", _df_plan, "diario")
+    .add("df_comidas", lambda por_comida: pd.DataFrame([{"Tiempo":m, **gr} for m,gr in por_comida.items()]), "por_comida"))
 
 # =================== Requerimientos ===================
 st.header("Requerimientos nutricionales")
@@ -244,8 +252,8 @@ if use_preset:
 else:
     c1, c2 = st.columns(2)
     with c1:
-        pct_prot = st.slider("Proteínas (%)", 10, 35, 20)
-        pct_fat  = st.slider("Grasas totales (%)", 20, 40, 30)
+        pct_prot = st.slider("Proteínas (%)", 10, 35, 20, step=5)
+        pct_fat  = st.slider("Grasas totales (%)", 20, 40, 30, step=5)
     with c2:
         sat = st.slider("De la grasa total → Saturadas (%)", 0, 15, 10)
         poli = st.slider("De la grasa total → Poliinsat. (%)", 5, 60, 35)
@@ -255,7 +263,14 @@ else:
 pct_cho = 100 - pct_prot - pct_fat
 st.info(f"CHO (%) se ajusta a: **{pct_cho}%** · Monoinsat. (%) se ajusta a: **{max(0,100-sat-poli)}%**")
 
-mac = macros(kcal, pct_prot, pct_fat, pct_cho, peso, pct_cho_complex, fat_split=(sat, poli, max(0,100-sat-poli)))
+res = calc.evaluate(dict(eq=eq, sexo=sexo, peso=peso, talla_cm=talla_cm, edad=edad, pal_key=pal_key, ade_on=ade_on,
+                         objetivo=objetivo, cintura=cintura, cadera=cadera, p_bi=p_bi, p_tri=p_tri, p_sub=p_sub, p_sup=p_sup,
+                         pct_prot=pct_prot, pct_fat=pct_fat, pct_cho_complex=pct_cho_complex, sat=sat, poli=poli),
+                    st.session_state.setdefault("_calc", {}))
+mb, tee, kcal, mac = res["mb"], res["tee"], res["kcal"], res["mac"]
+imc, icc, ict, pct_grasa_dw = res["imc"], res["icc"], res["ict"], res["pct_grasa_dw"]
+diario, por_comida = res["diario"], res["por_comida"]
+_sec("calc")   # nodos recalculados: spans calc.<nodo>
 
 # =================== KPIs ===================
 st.header("Resultados clínicos")
@@ -272,59 +287,123 @@ if pct_grasa_dw is not None: bf.append(f"{pct_grasa_dw}% (pliegues)")
 if bia_fat>0: bf.append(f"{bia_fat}% (BIA)")
 k2[2].markdown(f"<div class='card'><div class='kpi'>% Grasa: {' · '.join(bf) if bf else '—'}</div><div>Durnin–Womersley + Siri / BIA</div></div>", unsafe_allow_html=True)
 
+_sec("kpis")
+
 # =================== Intercambios ===================
 st.header("Plan por Intercambios")
-diario = exchanges_from_kcal(kcal); por_comida = distribute_by_meal(diario)
-df_plan = pd.DataFrame({
-    "Grupo": list(diario.keys()),
-    "Raciones/día": list(diario.values()),
-    "kcal/rac": [EXCHANGES[g]["kcal"] for g in diario.keys()],
-    "CHO": [EXCHANGES[g]["CHO"] for g in diario.keys()],
-    "PRO": [EXCHANGES[g]["PRO"] for g in diario.keys()],
-    "FAT": [EXCHANGES[g]["FAT"] for g in diario.keys()],
-    "Porción": [EXCHANGES[g]["portion"] for g in diario.keys()]
-})
-st.dataframe(df_plan, use_container_width=True, height=300)
-st.dataframe(pd.DataFrame([{"Tiempo":m, **gr} for m,gr in por_comida.items()]), use_container_width=True, height=240)
+st.dataframe(res["df_plan"], use_container_width=True, height=300)
+st.dataframe(res["df_comidas"], use_container_width=True, height=240)
+_sec("intercambios")
+
+from food_db import food_db
+from menu_engine import menu
+
+with st.expander("Sustituciones equivalentes"):
+    s1, s2 = st.columns([2, 1])
+    grupo_eq = s1.selectbox("Grupo", list(EXCHANGES.keys()))
+    n_eq = s2.number_input("Intercambios", 0.5, 4.0, 1.0, 0.5)
+    tol_eq = st.slider("Tolerancia (± %)", 5, 30, 10, 5)
+    equivs = food_db().equivalents(grupo_eq, n_eq, tol_eq/100, limit=30)
+    st.dataframe(pd.DataFrame(equivs) if equivs else pd.DataFrame(columns=["name","group","portion","kcal","CHO","PRO","FAT"]),
+                 use_container_width=True, hide_index=True)
+    q_food = st.text_input("Buscar alimento", placeholder="p. ej. platano")
+    if q_food: st.dataframe(pd.DataFrame(food_db().search(q_food)), use_container_width=True, hide_index=True)
+_sec("sustituciones")
+
+with st.expander("Menú de N días"):
+    dias_menu = st.slider("Días", 7, 30, 7)
+    restr = st.text_input("Excluir (alergias, no le gusta, religión; separado por comas)", placeholder="p. ej. lactosa, atún, halal")
+    m_dias = menu(por_comida, dias_menu, exclusions=[x for x in restr.split(",") if x.strip()])
+    st.dataframe(pd.DataFrame(m_dias), use_container_width=True, height=min(36*dias_menu + 40, 600))
+
+_sec("menu")
 
 # =================== Laboratorios (verde/ámbar/rojo) ===================
 st.header("Laboratorios – interpretación")
-def lab_card(nombre, valor, ok, warn=None):
-    if valor is None or valor==0: return
-    cls = "bg-ok" if ok else ("bg-warn" if (warn if warn is not None else False) else "bg-bad")
-    st.markdown(f"<div class='card {cls}'><b>{nombre}:</b> {valor}</div>", unsafe_allow_html=True)
-
-L1, L2, L3 = st.columns(3)
-with L1:
-    if glicemia>0: lab_card("Glucosa (mg/dL)", glicemia, 70<=glicemia<100, warn=(100<=glicemia<126))
-    if hba1c>0:   lab_card("HbA1c (%)", hba1c, hba1c<5.7, warn=(5.7<=hba1c<6.5))
-    if hdl>0:
-        low=40 if sexo.startswith("Mas") else 50
-        lab_card("HDL (mg/dL)", hdl, hdl>=low)
-with L2:
-    if ldl>0: lab_card("LDL (mg/dL)", ldl, ldl<100)
-    if tg>0:  lab_card("Triglicéridos (mg/dL)", tg, tg<150)
-    if tc>0:  lab_card("Colesterol total (mg/dL)", tc, tc<200)
-with L3:
-    if insulina>0: lab_card("Insulina (µUI/mL)", insulina, insulina<=25)
+# Umbrales en lab_rules.LAB_RULES (mismo motor que el cribado por lotes)
+from lab_rules import RULES as LAB_RULES
+LAB_CLS = {"ok": "bg-ok", "warn": "bg-warn", "bad": "bg-bad"}
+labs = {"glucose_mg_dl": glicemia, "hba1c_pct": hba1c, "insulin_uU_ml": insulina,
+        "lipids.tc": tc, "lipids.hdl": hdl, "lipids.ldl": ldl, "lipids.tg": tg,
+        "renal.creat": creat, "renal.uacr": uacr, "hepatic.alt": alt, "hepatic.ast": ast,
+        "iron.hb": hb, "iron.ferritin": ferritin}
+L = st.columns(3)
+for i, (_, nombre, unidad, valor, nivel) in enumerate(LAB_RULES.evaluate(labs, sexo)):
+    L[i % 3].markdown(f"<div class='card {LAB_CLS[nivel]}'><b>{nombre} ({unidad}):</b> {valor}</div>", unsafe_allow_html=True)
+
+_sec("laboratorios")
 
 # =================== Exportar DOCX ===================
 st.markdown("---")
+# Se genera en segundo plano (jobs.JobQueue) con id = hash del contenido del plan; la página no se bloquea
+# y sesiones con el mismo plan comparten el resultado hasta que caduca
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+def preparar_plan(plan_key, plan_in):
+    get_jobs().submit(plan_key, build_docx_plan_simple, plan_in["paciente"], plan_in["mb_r"], plan_in["tee"],
+                      plan_in["kcal"], plan_in["diario"], plan_in["fecha"], EXCHANGES, BRAND)
+    st.session_state["plan_docx"] = plan_key
+
+@st.fragment(run_every=1.0)
+def esperar_plan(plan_key):
+    # Solo este fragmento se repite mientras el trabajo está en cola o en curso
+    estado = get_jobs().status(plan_key)
+    if estado in (DONE, ERROR, None): st.rerun()
+    st.caption(f"⏳ Generando PLAN (DOCX)… ({'en cola' if estado == 'queued' else 'en curso'})")
+
 if DOCX:
-    doc = Document(); stl=doc.styles["Normal"]; stl.font.name="Calibri"; stl.font.size=Pt(11)
-    doc.add_heading("Plan de alimentación – " + BRAND, 0)
-    doc.add_paragraph(f"Paciente: {nombre or '—'}  |  Fecha: {date.today().isoformat()}")
-    doc.add_paragraph(f"MB: {round(mb)} kcal  |  TEE: {tee} kcal  |  Meta: {kcal} kcal")
-    t=doc.add_table(rows=1, cols=7)
-    for i,h in enumerate(["Lista","Raciones","kcal","CHO","PRO","FAT","Porción"]): t.rows[0].cells[i].text=h
-    for g,r in diario.items():
-        row=t.add_row().cells
-        row[0].text=g; row[1].text=str(r); row[2].text=str(EXCHANGES[g]["kcal"])
-        row[3].text=str(EXCHANGES[g]["CHO"]); row[4].text=str(EXCHANGES[g]["PRO"])
-        row[5].text=str(EXCHANGES[g]["FAT"]); row[6].text=EXCHANGES[g]["portion"]
-    bio=BytesIO(); doc.save(bio); bio.seek(0)
-    st.download_button("⬇️ Descargar PLAN (DOCX)", data=bio,
-        file_name="plan_nutritionsays.docx",
-        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    plan_in = dict(paciente=nombre or '—', mb_r=round(mb), tee=tee, kcal=kcal, diario=diario, fecha=date.today().isoformat())
+    plan_key = hashlib.sha256(json.dumps(plan_in, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+    estado = get_jobs().status(plan_key) if st.session_state.get("plan_docx") == plan_key else None
+    if estado is None:
+        st.button("📄 Preparar PLAN (DOCX)", on_click=preparar_plan, args=(plan_key, plan_in))
+    elif estado == DONE:
+        st.download_button("⬇️ Descargar PLAN (DOCX)", data=get_jobs().result(plan_key),
+            file_name="plan_nutritionsays.docx", mime=DOCX_MIME)
+    elif estado == ERROR:
+        st.error(f"No se pudo generar el DOCX: {get_jobs().error(plan_key)}")
+        st.button("🔁 Reintentar", on_click=preparar_plan, args=(plan_key, plan_in))
+    else:
+        esperar_plan(plan_key)
+
+_sec("export")
+
+# =================== Guardar consulta ===================
+if paciente_id and st.button("💾 Guardar consulta"):
+    registro = {
+        "patient": {"id": paciente_id, "name": nombre, "sex_at_birth": sexo},
+        "encounter": {"date": date.today().isoformat(), "type": "Control" if prev else "Inicial",
+                      "professional": BRAND, "age_y": edad},
+        "assessment": {
+            "anthropometrics": {"weight_kg": peso, "height_cm": talla_cm, "bmi": imc, "waist_cm": cintura, "hip_cm": cadera,
+                                "muac_cm": muac, "skinfolds": {"biceps": p_bi, "triceps": p_tri, "subscapular": p_sub, "suprailiac": p_sup},
+                                "body_comp": {"fat_pct": bia_fat or None}},   # solo BIA; el % por pliegues se recalcula de skinfolds
+            "biochem": {"glucose_mg_dl": glicemia, "hba1c_pct": hba1c, "insulin_uU_ml": insulina,
+                        "lipids": {"tc": tc, "hdl": hdl, "ldl": ldl, "tg": tg},
+                        "renal": {"creat": creat, "uacr": uacr}, "hepatic": {"alt": alt, "ast": ast},
+                        "iron": {"hb": hb, "ferritin": ferritin}},
+        },
+        "requirements": {"tmb": round(mb), "tee": tee, "kcal_target": kcal, "kcal_per_kg": round(kcal/peso, 1),
+                         "macros": {"protein": {"pct": mac["pct"]["prot"], "g": mac["g"]["prot"], "g_per_kg": mac["gkg"]["prot"]},
+                                    "fat": {"pct": mac["pct"]["fat"], "g": mac["g"]["fat"], "sat_g": mac["g"]["sat"],
+                                            "poly_g": mac["g"]["poli"], "mono_g": mac["g"]["mono"]},
+                                    "cho": {"pct": mac["pct"]["cho"], "g": mac["g"]["cho"], "complex_g": mac["g"]["cho_c"],
+                                            "simple_g": mac["g"]["cho_s"]}}},
+        "exchange_plan": {"daily_exchanges": diario, "by_meal": por_comida},
+    }
+    get_store().save(registro)
+    get_monitoring().append_record(registro)   # serie de seguimiento (pages/1_Monitoreo.py)
+    st.success("Consulta guardada")
 
 st.caption("Herramienta de apoyo clínico para profesionales. Ajustar a guías y juicio clínico. © " + BRAND)
+_sec("guardar"); _sec.done()
+
+# =================== Depuración (solo admin: NUTRI_PERF=1 y ?admin=<NUTRI_ADMIN_KEY>) ===================
+if perf.ENABLED and os.environ.get("NUTRI_ADMIN_KEY") and st.query_params.get("admin") == os.environ["NUTRI_ADMIN_KEY"]:
+    with st.expander("🛠️ Rendimiento (spans por sección)"):
+        st.dataframe(pd.DataFrame(perf.RECORDER.summary()), use_container_width=True, hide_index=True)
+        st.caption("Recalculado en este rerun: " + (", ".join(st.session_state["_calc"].get("ran", [])) or "nada"))
+        d1, d2 = st.columns(2)
+        d1.download_button("⬇️ Prometheus", perf.RECORDER.prometheus(), file_name="nutri_perf.prom", mime="text/plain")
+        if d2.button("Reiniciar histogramas"): perf.RECORDER.reset()
+perf.flush()
@@ -0,0 +1,106 @@
+# batch_plans.py — Modo por lotes sin interfaz: CSV/Parquet de pacientes → una fila de plan por paciente.
+#
+#   python batch_plans.py pacientes.csv planes.parquet --workers 8 --chunksize 50000
+#
+# Columnas de entrada (ver schema_nutri.json): sex_at_birth|sex, age, weight_kg, height_cm y, opcionales,
+# pa_level|activity, objective, pct_prot/pct_fat/pct_cho, pct_cho_complex, pliegues (biceps, triceps...).
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+import clinical_batch as cb
+
+ID_COLUMNS = ("id", "patient_id")
+INT_COLUMNS = ("tee", "kcal", "pct_prot", "pct_fat", "pct_cho")
+
+def plan_chunk(df, equation="mifflin", ade_on=False):
+    # Requerimientos → intercambios diarios → reparto por tiempo de comida, todo vectorizado
+    req = cb.requirements_frame(df, equation=equation, ade_on=ade_on)
+    diario = cb.exchanges_from_kcal(req["kcal"].to_numpy(), req["pct_prot"].to_numpy(), req["pct_fat"].to_numpy())
+    por_comida = cb.distribute_by_meal(diario)
+    cols = {c: df[c].to_numpy() for c in ID_COLUMNS if c in df.columns}
+    cols.update({c: req[c].to_numpy() for c in req.columns})
+    cols.update({f"ex_{g}": v for g, v in diario.items()})
+    cols.update({f"{m}_{g}": v for m, gr in por_comida.items() for g, v in gr.items()})
+    # Enteros anulables: una fila sin peso/talla/edad sale vacía (null) y el tipo no cambia entre bloques
+    for c in (*INT_COLUMNS, *(f"ex_{g}" for g in diario)): cols[c] = pd.array(cols[c], dtype="Int64")
+    return pd.DataFrame(cols)
+
+def _parquet(path):
+    # pyarrow solo hace falta para .parquet/.pq (requirements.txt); sin él, error claro en vez de ImportError
+    if not path.lower().endswith((".parquet", ".pq")): return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise SystemExit(f"{path}: leer/escribir Parquet requiere pyarrow (pip install pyarrow); usar .csv si no")
+    return True
+
+def read_chunks(path, chunksize):
+    if _parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+class ChunkWriter:
+    """Escribe los bloques a medida que llegan (CSV con append o Parquet por row groups)."""
+    def __init__(self, path):
+        self.path, self.parquet, self._pq = path, _parquet(path), None
+        self._first = True
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa, pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._pq is None: self._pq = pq.ParquetWriter(self.path, table.schema)
+            self._pq.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._pq is not None: self._pq.close()
+
+def run(src, dst, workers=None, chunksize=50_000, equation="mifflin", ade_on=False, log=sys.stderr):
+    workers = workers or os.cpu_count() or 1
+    fn = partial(plan_chunk, equation=equation, ade_on=ade_on)
+    writer = ChunkWriter(dst); rows = 0; t0 = time.perf_counter()
+    try:
+        if workers == 1:
+            results = map(fn, read_chunks(src, chunksize))
+            for out in results: writer.write(out); rows += len(out)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                # Ventana acotada de bloques en vuelo: memoria plana y orden de salida = orden de entrada
+                pending = []
+                for chunk in read_chunks(src, chunksize):
+                    pending.append(ex.submit(fn, chunk))
+                    if len(pending) >= 2*workers:
+                        out = pending.pop(0).result(); writer.write(out); rows += len(out)
+                for fut in pending:
+                    out = fut.result(); writer.write(out); rows += len(out)
+    finally:
+        writer.close()
+    dt = time.perf_counter() - t0
+    print(f"{rows} pacientes en {dt:.2f} s · {rows/dt if dt else 0:,.0f} filas/s · {workers} procesos", file=log)
+    return rows, dt
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Genera planes (MB/TEE/kcal/macros/intercambios) por lotes.")
+    ap.add_argument("entrada", help="CSV o Parquet de pacientes")
+    ap.add_argument("salida", help="CSV o Parquet de planes")
+    ap.add_argument("--workers", type=int, default=None, help="Procesos (por defecto: núcleos disponibles)")
+    ap.add_argument("--chunksize", type=int, default=50_000, help="Filas por bloque")
+    ap.add_argument("--equation", choices=["mifflin", "harris"], default="mifflin")
+    ap.add_argument("--ade", action="store_true", help="Añadir ADE/TEF (~10%%) al TEE")
+    a = ap.parse_args(argv)
+    run(a.entrada, a.salida, a.workers, a.chunksize, a.equation, a.ade)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# benchmarks.py — Suite de rendimiento reproducible: cálculo escalar vs lotes, intercambios, exportadores
+# DOCX/FHIR y un rerun completo de app.py (AppTest, sin navegador). Resultados en JSON; con línea base
+# guardada, sale con código 1 si algún caso pierde más de --threshold de su rendimiento.
+#
+#   python benchmarks.py                          # todo; compara con benchmarks_baseline.json si existe
+#   python benchmarks.py --only calc,exchanges    # prefijos de caso
+#   python benchmarks.py --save-baseline          # fija la línea base con esta corrida
+#   python benchmarks.py --threshold 0.2 --out bench.json
+#
+# Métrica: operaciones/s, la mejor de --repeat rondas de al menos --min-time s (cada caso declara cuántas
+# operaciones hace una llamada: pacientes, planes, documentos, reruns).
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+BASELINE = "benchmarks_baseline.json"
+THRESHOLD = 0.25
+N_SCALAR, N_BATCH = 10_000, 100_000
+CASES = {}   # nombre → (preparar() → (fn, ops), opciones)
+
+def case(name, memory=False, calls=None, threshold=None):
+    """Registra un caso. memory: medir pico de tracemalloc de una llamada; calls: llamadas fijas por
+    ronda (casos lentos); threshold: tolerancia propia (p. ej. el rerun de la app, más ruidoso)."""
+    def deco(setup):
+        CASES[name] = (setup, {"memory": memory, "calls": calls, "threshold": threshold})
+        return setup
+    return deco
+
+def _patients(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {"sex": np.where(rng.random(n) < 0.5, "Masculino", "Femenino"), "weight_kg": rng.uniform(45, 130, n).round(1),
+            "height_cm": rng.uniform(145, 195, n).round(), "age": rng.integers(18, 85, n),
+            "kcal": (rng.uniform(1200, 3500, n) // 10 * 10)}
+
+def _payload():
+    # Consulta completa con las claves que usan los exportadores
+    from clinical_calc import macros
+    from exchanges_catalog import EXCHANGES
+    mac = macros(1800, 20, 30, 50, 70.0)
+    return {"fecha": "2024-05-01", "paciente": "Ana Pérez", "profesional": "@nutritionsays", "patient_id": "P-001",
+            "kcal": 1800, "kcal_kg": 25.7, "gkg_prot": mac["gkg"]["prot"], "prot_gkg": mac["gkg"]["prot"], "macros": mac,
+            "evaluation": "IMC 25,7; cintura 88 cm; HbA1c 5,9 %.", "pes_list": ["Ingesta energética excesiva (NI-1.3)"],
+            "prescription": "Plan hipocalórico 1800 kcal por intercambios.", "monitoring": "Control en 4 semanas.",
+            "sodium": {"target_mg": 2000, "current_mg": 3200, "remaining_mg": 0, "salt_g": 5.0, "tsp": 1.0},
+            "diagnostico": "Sobrepeso con prediabetes.", "peso": 70.0, "talla_m": 1.65, "imc": 25.7, "cintura": 88, "cadera": 100,
+            "whr": 0.88, "whtr": 0.53, "bf_txt": "32 % (BIA)", "comidas": 5, "agua_l": 2.0, "objetivo": "Pérdida de peso",
+            "otras": "", "catalog": EXCHANGES, "menu_days": 7,
+            "nutrition_order": {"diet_type": "Hipocalórica", "texture": "Normal", "exclusions": ["lactosa"], "supplements": []}}
+
+# ---------- cálculo ----------
+@case("calc.mifflin_scalar")
+def _():
+    from clinical_calc import mifflin_st_jeor
+    p = {k: v[:N_SCALAR].tolist() for k, v in _patients(N_SCALAR).items()}
+    rows = list(zip(p["sex"], p["weight_kg"], p["height_cm"], p["age"]))
+    return (lambda: [mifflin_st_jeor(*r) for r in rows]), len(rows)
+
+@case("calc.mifflin_batch")
+def _():
+    import clinical_batch as cb
+    p = _patients(N_BATCH)
+    return (lambda: cb.mifflin_st_jeor(p["sex"], p["weight_kg"], p["height_cm"], p["age"])), N_BATCH
+
+@case("calc.macros_scalar")
+def _():
+    from clinical_calc import macros
+    p = _patients(N_SCALAR)
+    rows = list(zip(p["kcal"].tolist(), p["weight_kg"].tolist()))
+    return (lambda: [macros(k, 20, 30, 50, w) for k, w in rows]), len(rows)
+
+@case("calc.macros_batch")
+def _():
+    import clinical_batch as cb
+    p = _patients(N_BATCH)
+    return (lambda: cb.macros(p["kcal"], 20, 30, 50, p["weight_kg"])), N_BATCH
+
+# ---------- intercambios ----------
+@case("exchanges.plan_scalar")
+def _():
+    from exchanges_catalog import distribute_by_meal, exchanges_from_kcal
+    kcals = _patients(1000)["kcal"].tolist()
+    return (lambda: [distribute_by_meal(exchanges_from_kcal(k)) for k in kcals]), len(kcals)
+
+@case("exchanges.plan_batch")
+def _():
+    import clinical_batch as cb
+    k = _patients(N_BATCH)["kcal"]
+    return (lambda: cb.distribute_by_meal(cb.exchanges_from_kcal(k))), N_BATCH
+
+# ---------- exportadores ----------
+@case("export.docx_note", memory=True)
+def _():
+    from exporters import DOCX, build_docx_note
+    if not DOCX: return None
+    payload = _payload()
+    return (lambda: build_docx_note("Inicial", payload)), 1
+
+@case("export.docx_plan", memory=True)
+def _():
+    from exchanges_catalog import distribute_by_meal, exchanges_from_kcal
+    from exporters import DOCX, build_docx_plan_nutritionsays
+    if not DOCX: return None
+    payload = _payload(); daily = exchanges_from_kcal(payload["kcal"])
+    by_meal = distribute_by_meal(daily)
+    return (lambda: build_docx_plan_nutritionsays(payload, daily, by_meal)), 1
+
+@case("export.fhir")
+def _():
+    from exporters import fhir_nutrition_intake, fhir_nutrition_order
+    payload = _payload(); payload.pop("catalog")
+    return (lambda: (json.dumps(fhir_nutrition_order(payload), ensure_ascii=False),
+                     json.dumps(fhir_nutrition_intake(payload), ensure_ascii=False))), 1
+
+# ---------- app completa ----------
+@case("app.rerun", calls=3, threshold=0.5)
+def _():
+    # Rerun sin caché de script: cada llamada cambia el peso (recalcula el grafo y redibuja todo)
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"), default_timeout=120).run()
+    if at.exception: raise RuntimeError(at.exception[0].value)
+    peso = next(w for w in at.number_input if w.label == "Peso (kg)")
+    state = {"v": 70.0}
+    def rerun():
+        state["v"] = 70.0 + (state["v"] - 69.9) % 30
+        peso.set_value(round(state["v"], 1)); at.run()
+    return rerun, 1
+
+# ---------- ejecución ----------
+def measure(fn, ops, min_time=0.5, repeat=5, calls=None):
+    fn()   # calentamiento (cachés, imports perezosos)
+    if calls is None:
+        calls, t = 1, 0.0
+        while True:
+            t0 = time.perf_counter()
+            for _ in range(calls): fn()
+            t = time.perf_counter() - t0
+            if t >= min_time / 4: break
+            calls *= 4
+        calls = max(1, int(calls * min_time / max(t, 1e-9)))
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(calls): fn()
+        best = min(best, (time.perf_counter() - t0) / calls)
+    return {"ops_s": round(ops / best, 2), "ms_per_call": round(best * 1e3, 4), "ops_per_call": ops, "calls": calls}
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn(); return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+def run(only=None, min_time=0.5, repeat=5, log=sys.stderr):
+    results = {}
+    for name, (setup, opt) in CASES.items():
+        if only and not any(name.startswith(p) for p in only): continue
+        prepared = setup()
+        if prepared is None:
+            print(f"{name:24s} omitido (dependencia no instalada)", file=log); continue
+        fn, ops = prepared
+        r = measure(fn, ops, min_time, repeat if opt["calls"] is None else 1, opt["calls"])
+        if opt["memory"]: r["peak_kb"] = peak_memory(fn)
+        results[name] = r
+        print(f"{name:24s} {r['ops_s']:>14,.1f} ops/s  {r['ms_per_call']:>10.3f} ms/llamada"
+              + (f"  pico {r['peak_kb']:,.0f} KB" if "peak_kb" in r else ""), file=log)
+    return results
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """[(caso, ratio, tolerancia, regresión)] para los casos presentes en ambos."""
+    out = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b: continue
+        tol = CASES.get(name, (None, {}))[1].get("threshold") or threshold
+        ratio = r["ops_s"] / b["ops_s"]
+        out.append((name, ratio, tol, ratio < 1 - tol))
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks de cálculo, intercambios, exportadores y app.")
+    ap.add_argument("--only", default="", help="prefijos separados por coma (calc, exchanges, export, app)")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD, help="caída máxima tolerada (0.25 = 25%%)")
+    ap.add_argument("--min-time", type=float, default=0.5)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out", default=None, help="JSON con los resultados de esta corrida")
+    a = ap.parse_args(argv)
+    only = [p.strip() for p in a.only.split(",") if p.strip()]
+    results = run(only, a.min_time, a.repeat)
+    doc = {"meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                    "machine": platform.machine(), "cpus": os.cpu_count()}, "results": results}
+    if a.out:
+        with open(a.out, "w", encoding="utf-8") as f: json.dump(doc, f, indent=2)
+    if a.save_baseline:
+        # Se conservan los casos de la línea base que no se corrieron ahora (--only)
+        prev = json.load(open(a.baseline, encoding="utf-8"))["results"] if os.path.exists(a.baseline) else {}
+        doc["results"] = {**prev, **results}
+        with open(a.baseline, "w", encoding="utf-8") as f: json.dump(doc, f, indent=2)
+        print(f"línea base → {a.baseline}", file=sys.stderr); return 0
+    if not os.path.exists(a.baseline):
+        print(f"sin línea base ({a.baseline}); usar --save-baseline", file=sys.stderr); return 0
+    with open(a.baseline, encoding="utf-8") as f: baseline = json.load(f)["results"]
+    failed = 0
+    for name, ratio, tol, bad in compare(results, baseline, a.threshold):
+        failed += bad
+        print(f"{name:24s} {ratio:6.2f}× línea base" + (f"  REGRESIÓN (> {tol:.0%})" if bad else ""), file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# bulk_export.py — Exportación masiva de planes (build_docx_plan_nutritionsays) y notas ADIME
+# (build_docx_note) a un único ZIP en disco, renderizando en un pool de procesos.
+#
+#   python bulk_export.py trabajos.jsonl entregables.zip --workers 8
+#
+# Cada línea de trabajos.jsonl:
+#   {"name": "ana_plan.docx", "kind": "plan", "payload": {...}, "daily": {...}, "by_meal": {...}}
+#   {"name": "ana_nota.docx", "kind": "note", "note_kind": "Inicial", "payload": {...}}
+# Si se interrumpe, volver a ejecutar el mismo comando continúa donde quedó (las entradas ya
+# presentes en el ZIP se omiten).
+import argparse
+import json
+import os
+import struct
+import sys
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import exporters
+from exchanges_catalog import EXCHANGES
+
+_EOCD = struct.Struct("<4s4H2LH")   # End Of Central Directory (sin comentario)
+
+def render_job(job):
+    # Se ejecuta en el proceso hijo; la plantilla DOCX se compila una vez por proceso
+    try:
+        if job["kind"] == "plan":
+            payload = dict(job["payload"]); payload.setdefault("catalog", EXCHANGES)
+            bio = exporters.build_docx_plan_nutritionsays(payload, job["daily"], job["by_meal"])
+        elif job["kind"] == "note":
+            bio = exporters.build_docx_note(job.get("note_kind", "Inicial"), job["payload"])
+        else:
+            raise ValueError(f"Tipo de documento desconocido: {job['kind']}")
+        if bio is None: raise RuntimeError("python-docx no está instalado")
+        return job["name"], bio.getvalue(), None
+    except Exception as e:
+        return job["name"], None, f"{type(e).__name__}: {e}"
+
+def _checkpoint_path(path): return path + ".ckpt"
+
+def _save_checkpoint(path):
+    # Copia del directorio central tras cerrar el ZIP: permite reparar el archivo si el proceso
+    # muere mientras se añaden entradas (el modo 'a' sobrescribe el directorio anterior)
+    with open(path, "rb") as f:
+        f.seek(-_EOCD.size, 2); eocd = f.read()
+        cd_offset = _EOCD.unpack(eocd)[6]
+        f.seek(cd_offset); tail = f.read()
+    with open(_checkpoint_path(path), "wb") as f:
+        f.write(struct.pack("<Q", cd_offset) + tail)
+
+def _recover(path):
+    # Si el final del ZIP no coincide con el último punto de control, el proceso murió a mitad de
+    # escritura: se trunca al punto de control y se restaura su directorio central
+    ckpt = _checkpoint_path(path)
+    if not os.path.exists(ckpt): return
+    with open(ckpt, "rb") as f:
+        cd_offset = struct.unpack("<Q", f.read(8))[0]; tail = f.read()
+    with open(path, "r+b") as f:
+        f.seek(cd_offset)
+        if f.read() == tail: return
+        f.truncate(cd_offset); f.seek(cd_offset); f.write(tail)
+
+def _open_archive(path, resume):
+    if resume and os.path.exists(path):
+        _recover(path)
+    else:
+        # ZIP vacío + punto de control desde el inicio: siempre hay un estado al que volver
+        zipfile.ZipFile(path, "w").close(); _save_checkpoint(path)
+    zf = zipfile.ZipFile(path, "a")
+    return zf, set(zf.namelist())
+
+def _report(done, failed, skipped, name):
+    print(f"\r{done} listos · {failed} con error · {skipped} omitidos · {name[:40]:<40}", end="", file=sys.stderr)
+
+def export_zip(path, jobs, workers=None, resume=True, progress=_report, checkpoint_every=50):
+    """Renderiza `jobs` (iterable de dicts, ver cabecera) y escribe cada DOCX en `path` al terminar.
+
+    Solo hay en memoria los documentos en vuelo (2 por proceso). Un nombre repetido en `jobs` se
+    reporta en "failed" y solo se escribe el primero. Devuelve
+    {"written": n, "skipped": n, "failed": [(name, error), ...]}.
+    """
+    workers = workers or os.cpu_count() or 1
+    zf, present = _open_archive(path, resume)
+    written, skipped, failed = 0, 0, []
+
+    def store(result):
+        nonlocal zf, written
+        name, data, err = result
+        if err: failed.append((name, err))
+        else:
+            # El DOCX ya va comprimido: se guarda sin recomprimir
+            zf.writestr(name, data, compress_type=zipfile.ZIP_STORED); present.add(name); written += 1
+            if written % checkpoint_every == 0:
+                zf.close(); _save_checkpoint(path); zf = zipfile.ZipFile(path, "a")
+        if progress: progress(written, len(failed), skipped, name)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            pending, submitted = set(), set()
+            for job in jobs:
+                if job["name"] in present:
+                    skipped += 1; continue
+                if job["name"] in submitted:
+                    # Repetido en esta corrida (el primero puede seguir en vuelo): no se duplica la entrada del ZIP
+                    failed.append((job["name"], "nombre repetido en los trabajos")); continue
+                submitted.add(job["name"])
+                pending.add(ex.submit(render_job, job))
+                if len(pending) >= 2*workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done: store(fut.result())
+            for fut in pending: store(fut.result())
+    finally:
+        zf.close(); _save_checkpoint(path)
+    if progress: print(file=sys.stderr)
+    return {"written": written, "skipped": skipped, "failed": failed}
+
+def read_jobs(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip(): yield json.loads(line)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Exporta planes y notas DOCX en bloque a un ZIP.")
+    ap.add_argument("trabajos", help="JSONL con un documento por línea")
+    ap.add_argument("zip", help="Archivo ZIP de salida (se reanuda si ya existe)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--no-resume", action="store_true", help="Sobrescribir el ZIP en lugar de continuar")
+    a = ap.parse_args(argv)
+    res = export_zip(a.zip, read_jobs(a.trabajos), a.workers, resume=not a.no_resume)
+    for name, err in res["failed"]: print(f"ERROR {name}: {err}", file=sys.stderr)
+    print(f"{res['written']} escritos, {res['skipped']} omitidos, {len(res['failed'])} con error", file=sys.stderr)
+    return 1 if res["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+# calc_graph.py — Grafo de cálculo reactivo: cada nodo declara sus entradas y solo se recalcula
+# cuando alguna cambió respecto a la ejecución anterior (estado guardado por sesión).
+import perf
+
+_MISSING = object()
+
+def _same(a, b):
+    if a is b: return True
+    if hasattr(a, "equals"):   # DataFrame / Series
+        try: return type(a) is type(b) and bool(a.equals(b))
+        except Exception: return False
+    try: return bool(a == b)
+    except Exception: return False
+
+class CalcGraph:
+    """Nodos en orden de definición (cada uno solo puede depender de entradas o nodos anteriores).
+
+        g = CalcGraph()
+        g.add("tee", tee_ambulatorio, "mb", "pal", "ade_on")
+        res = g.evaluate({"mb": 1500, "pal": 1.6, "ade_on": False}, st.session_state.setdefault("_calc", {}))
+    """
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, name, fn, *inputs):
+        # Span "calc.<nodo>" por cada recálculo (solo con NUTRI_PERF; si no, fn tal cual)
+        self.nodes[name] = (perf.timed(f"calc.{name}")(fn), inputs)
+        return self
+
+    def evaluate(self, values, state):
+        prev_in, prev_out = state.get("inputs", {}), state.get("results", {})
+        env = dict(values)
+        changed = {k for k, v in values.items() if not _same(prev_in.get(k, _MISSING), v)}
+        ran = []
+        for name, (fn, inputs) in self.nodes.items():
+            if name in prev_out and not changed.intersection(inputs):
+                env[name] = prev_out[name]; continue
+            out = fn(*(env[i] for i in inputs)); ran.append(name)
+            # Corte temprano: si el resultado no cambió, los dependientes no se recalculan
+            if name not in prev_out or not _same(prev_out[name], out): changed.add(name)
+            env[name] = out
+        state["inputs"] = dict(values)
+        state["results"] = {n: env[n] for n in self.nodes}
+        state["ran"] = ran
+        return env
@@ -0,0 +1,181 @@
+# clinical_batch.py — Versión vectorizada (NumPy/pandas) de clinical_calc para cohortes completas.
+# Cada función acepta escalares o arrays y devuelve arrays; el redondeo replica exactamente
+# al round() de Python que usan las funciones escalares.
+import math
+
+import numpy as np
+import pandas as pd
+
+from clinical_calc import ACTIVITY, PAL, DW
+from exchange_solver import GROUPS, plan_for
+from exchanges_catalog import MEAL_SPLIT
+
+def _arr(x, dtype=None):
+    return np.asarray(x, dtype=dtype)
+
+def _prod_err(a, b):
+    # Error exacto de a*b (TwoProduct de Dekker con partición de Veltkamp)
+    c = 134217729.0*a; ah = c - (c - a); al = a - ah
+    c = 134217729.0*b; bh = c - (c - b); bl = b - bh
+    return ((ah*bh - a*b) + ah*bl + al*bh) + al*bl
+
+def _round(x, nd=0):
+    # round() de Python redondea el valor binario exacto (empates al par); np.round trabaja sobre x*10**nd
+    # ya redondeado. Con el error exacto del producto se decide cada caso igual que round().
+    x = np.asarray(x, dtype=float)
+    p = 10.0**nd
+    y = x*p
+    k = np.floor(y)
+    s = ((y - k) - 0.5) + _prod_err(x, p)
+    r = k + ((s > 0) | ((s == 0) & (np.fmod(k, 2) != 0)))
+    if nd: return r/p
+    # Enteros como round(); si falta algún dato (NaN) se queda en float para no convertirlo en basura
+    return r if np.isnan(r).any() else r.astype(np.int64)
+
+def _map_labels(values, fn):
+    # Aplica fn a cada etiqueta distinta (no a cada fila): O(n) con hash + O(k) Python
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object).ravel(), use_na_sentinel=False)
+    mapped = np.asarray([fn(u) for u in uniques])
+    if not len(mapped): return np.zeros(np.shape(values), dtype=bool)
+    return mapped[codes].reshape(np.shape(values))
+
+def is_male(sex):
+    sex = _arr(sex)
+    if sex.dtype==bool: return sex
+    return _map_labels(sex, lambda s: str(s).lower().startswith("m"))
+
+def mifflin_st_jeor(sex, weight_kg, height_cm, age_y):
+    return 10*_arr(weight_kg) + 6.25*_arr(height_cm) - 5*_arr(age_y) + np.where(is_male(sex), 5, -161)
+
+def harris_benedict(sex, weight_kg, height_cm, age_y):
+    w, h, a = _arr(weight_kg), _arr(height_cm), _arr(age_y)
+    return np.where(is_male(sex),
+                    66.47 + (13.75*w) + (5.003*h) - (6.755*a),
+                    655.09 + (9.563*w) + (1.850*h) - (4.676*a))
+
+def activity_factor(activity):
+    # Claves de ACTIVITY (clinical_calc), de PAL (app) o factores numéricos
+    activity = _arr(activity)
+    if activity.dtype.kind in "fiu": return activity.astype(float)
+    return _map_labels(activity, lambda k: ACTIVITY.get(k, PAL.get(k, 1.2))).astype(float)
+
+def tee_from_tmb(tmb, activity_key):
+    return _round(_arr(tmb) * activity_factor(activity_key))
+
+def tee_ambulatorio(mb, pal, ade_on=False):
+    base = _arr(mb) * activity_factor(pal)
+    base = np.where(_arr(ade_on, bool), base*1.10, base)
+    return _round(base)
+
+def kcal_target(tee, objective):
+    tee = _arr(tee)
+    loss = _map_labels(objective, lambda o: str(o).startswith("Pérdida"))
+    gain = _map_labels(objective, lambda o: str(o).startswith("Ganancia"))
+    return np.where(loss, np.maximum(1000, tee - np.where(tee>=1600, 400, 200)),
+                    np.where(gain, tee + 200, tee))
+
+def macros(kcal, pct_prot, pct_fat, pct_cho, weight_kg, pct_cho_complex=85, fat_split=(10,35,55)):
+    kcal, w = _arr(kcal), _arr(weight_kg, float)
+    pct_prot, pct_fat, pct_cho = _arr(pct_prot), _arr(pct_fat), _arr(pct_cho)
+    # Normalizar porcentajes
+    total = pct_prot + pct_fat + pct_cho
+    pct_prot = _round(100*pct_prot/total); pct_fat = _round(100*pct_fat/total); pct_cho = 100 - pct_prot - pct_fat
+    g_prot = _round((kcal*pct_prot/100)/4,1)
+    g_fat  = _round((kcal*pct_fat /100)/9,1)
+    g_cho  = _round((kcal*pct_cho /100)/4,1)
+    safe_w = np.where(w!=0, w, 1.0)
+    gkg_prot = np.where(w!=0, _round(g_prot/safe_w,2), 0.0)
+    gkg_cho  = np.where(w!=0, _round(g_cho/safe_w,2), 0.0)
+    # CHO complejos vs simples
+    g_cho_c = _round(g_cho*_arr(pct_cho_complex)/100,1); g_cho_s = _round(g_cho - g_cho_c,1)
+    # Desglose grasas (sat, poli, mono) en % de fat
+    sat, poli, mono = (_arr(v) for v in fat_split)
+    subtotal = np.maximum(1, sat+poli+mono)
+    sat = pct_fat*sat/subtotal; poli = pct_fat*poli/subtotal; mono = pct_fat - sat - poli
+    g_sat  = _round((kcal*sat /100)/9,1)
+    g_poli = _round((kcal*poli/100)/9,1)
+    g_mono = _round((kcal*mono/100)/9,1)
+    return {
+        "pct":{"prot":pct_prot,"fat":pct_fat,"cho":pct_cho},
+        "g":{"prot":g_prot,"fat":g_fat,"cho":g_cho,"cho_c":g_cho_c,"cho_s":g_cho_s,"sat":g_sat,"poli":g_poli,"mono":g_mono},
+        "gkg":{"prot":gkg_prot,"cho":gkg_cho}
+    }
+
+def bmi(weight_kg, height_cm):
+    h = np.maximum(1e-6, _arr(height_cm)/100)
+    return _round(_arr(weight_kg)/(h*h),2)
+
+def dw_density(sex, age, biceps, triceps, subesc, supra):
+    folds = [np.nan_to_num(_arr(v, float)) for v in (biceps, triceps, subesc, supra)]
+    # math.log10 sobre las sumas distintas (pliegues en pasos de 0.5 mm → pocas) para igualar al escalar
+    logS = _map_labels(np.maximum(0.1, folds[0]+folds[1]+folds[2]+folds[3]), math.log10).astype(float)
+    female = _map_labels(sex, lambda s: str(s).lower().startswith("f"))
+    age = _arr(age)
+    a = np.empty(np.shape(logS)); b = np.empty(np.shape(logS))
+    for key, mask in (("F", female), ("M", ~female)):
+        ups = np.array([up for up,_ in DW[key]]); ab = np.array([c for _,c in DW[key]])
+        # Primer tramo con age<=up; por encima del último se usa el último
+        i = np.minimum(np.searchsorted(ups, age, side="left"), len(ups)-1)
+        a = np.where(mask, ab[i,0], a); b = np.where(mask, ab[i,1], b)
+    return a - (b*logS)
+
+def siri_pctfat(d): return _round(((4.95/_arr(d))-4.50)*100,1)
+
+def exchanges_from_kcal(k, pct_prot=20, pct_fat=30):
+    # Una consulta a exchange_solver por combinación distinta (kcal redondeadas a 10, %PRO, %FAT)
+    # Filas con kcal o % faltantes (NaN) → raciones NaN (no 0 ni enteros inválidos)
+    k, p, f = np.broadcast_arrays(_arr(k, float), _arr(pct_prot, float), _arr(pct_fat, float))
+    bad = np.isnan(k) | np.isnan(p) | np.isnan(f)
+    k = np.where(bad, 0, k)
+    k10 = np.where(k > 0, _round(np.maximum(k, 0)/10)*10, 0)
+    p, f = np.where(bad, 0, p).astype(np.int64), np.where(bad, 0, f).astype(np.int64)
+    keys, inv = np.unique(np.stack([k10.ravel(), p.ravel(), f.ravel()], axis=1), axis=0, return_inverse=True)
+    plans = np.array([list(plan_for(*map(int, key)).values()) for key in keys], dtype=np.int64).reshape(-1, len(GROUPS))
+    rows = plans[inv.ravel()].reshape(*k10.shape, len(GROUPS))
+    if bad.any(): rows = np.where(bad[..., None], np.nan, rows)
+    return {g: rows[..., i] for i, g in enumerate(GROUPS)}
+
+def distribute_by_meal(d):
+    return {m: {g: _round(_arr(tot)*fr,1) for g, tot in d.items()} for m, fr in MEAL_SPLIT.items()}
+
+# Alias de columnas según schema_nutri.json (patient / assessment.anthropometrics / lifestyle)
+COLUMNS = {
+    "sex": ("sex","sex_at_birth","sexo"),
+    "age": ("age","age_y","edad"),
+    "weight_kg": ("weight_kg","peso"),
+    "height_cm": ("height_cm","talla_cm"),
+    "activity": ("activity","pa_level","pal"),
+    "objective": ("objective","objetivo"),
+}
+SKINFOLDS = ("biceps","triceps","subscapular","suprailiac")
+
+def _col(df, name, default=None):
+    for c in COLUMNS.get(name, (name,)):
+        if c in df.columns: return df[c].to_numpy()
+    if default is None: raise KeyError(f"Falta la columna '{name}' (alias: {', '.join(COLUMNS.get(name,(name,)))})")
+    return np.full(len(df), default)
+
+def requirements_frame(df, equation="mifflin", ade_on=False, pct_prot=20, pct_fat=30, pct_cho=50,
+                       pct_cho_complex=85, fat_split=(10,35,55)):
+    """Calcula MB/TEE/kcal/macros de todas las filas en una sola pasada vectorizada.
+
+    Los porcentajes pueden venir como columnas (pct_prot, pct_fat, pct_cho) o como escalares.
+    Si hay columnas de pliegues (biceps, triceps, subscapular, suprailiac) añade densidad y % grasa.
+    """
+    sex, w, h, age = _col(df,"sex"), _col(df,"weight_kg"), _col(df,"height_cm"), _col(df,"age")
+    bmr = (harris_benedict if equation.lower().startswith("harris") else mifflin_st_jeor)(sex, w, h, age)
+    activity = _col(df, "activity", "Reposo")
+    ade = _col(df, "ade_on", ade_on).astype(bool)
+    # Claves de ACTIVITY (clinical_calc), de PAL (app) o factor numérico; ADE opcional por fila
+    tee = tee_ambulatorio(bmr, activity, ade)
+    kcal = kcal_target(tee, _col(df, "objective", "Mantenimiento"))
+    pp, pf, pc = (_col(df, c, d) for c, d in (("pct_prot",pct_prot),("pct_fat",pct_fat),("pct_cho",pct_cho)))
+    m = macros(kcal, pp, pf, pc, w, _col(df, "pct_cho_complex", pct_cho_complex), fat_split)
+    out = {"bmr": bmr, "tee": tee, "kcal": kcal, "bmi": bmi(w, h)}
+    out.update({f"pct_{k}": v for k, v in m["pct"].items()})
+    out.update({f"g_{k}": v for k, v in m["g"].items()})
+    out.update({f"gkg_{k}": v for k, v in m["gkg"].items()})
+    if any(c in df.columns for c in SKINFOLDS):
+        dens = dw_density(sex, age, *(_col(df, c, 0.0) for c in SKINFOLDS))
+        out["density"] = dens; out["fat_pct_dw"] = siri_pctfat(dens)
+    return pd.DataFrame(out, index=df.index)
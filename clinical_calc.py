@@ -1,16 +1,46 @@
+import math
+
 def mifflin_st_jeor(sex, weight_kg, height_cm, age_y):
     return (10*weight_kg + 6.25*height_cm - 5*age_y + (5 if sex.lower().startswith("m") else -161))
 
+def harris_benedict(sex, weight_kg, height_cm, age_y):
+    if sex.lower().startswith("m"): return 66.47 + (13.75*weight_kg) + (5.003*height_cm) - (6.755*age_y)
+    return 655.09 + (9.563*weight_kg) + (1.850*height_cm) - (4.676*age_y)
+
 ACTIVITY = {"Reposo":1.2,"Ligera":1.375,"Moderada":1.55,"Alta":1.725}
+PAL = {"Muy bajo (sedentario)":1.2, "Ligero":1.4, "Moderado":1.6, "Alto":1.75, "Muy alto":2.0}
 
 def tee_from_tmb(tmb, activity_key):
     return round(tmb * ACTIVITY.get(activity_key, 1.2))
 
+def tee_ambulatorio(mb, pal, ade_on=False):
+    base = mb * pal
+    if ade_on: base *= 1.10
+    return round(base)
+
 def kcal_target(tee, objective):
-    if objective=="Pérdida": return max(1000, tee - (400 if tee>=1600 else 200))
-    if objective=="Ganancia": return tee + 200
+    # Acepta "Pérdida"/"Ganancia" y las etiquetas largas de la app ("Pérdida de peso", "Ganancia (magro)")
+    if objective.startswith("Pérdida"): return max(1000, tee - (400 if tee>=1600 else 200))
+    if objective.startswith("Ganancia"): return tee + 200
     return tee
 
+# Durnin–Womersley: (edad máx, (a, b)) por sexo
+DW = {
+    "F":[(17,(1.1549,0.0678)),(29,(1.1599,0.0717)),(39,(1.1423,0.0632)),(49,(1.1333,0.0612)),(120,(1.1339,0.0645))],
+    "M":[(17,(1.1620,0.0630)),(29,(1.1631,0.0632)),(39,(1.1422,0.0544)),(49,(1.1620,0.0700)),(120,(1.1715,0.0779))]
+}
+
+def dw_density(sex, age, biceps, triceps, subesc, supra):
+    S = max(0.1, (biceps or 0)+(triceps or 0)+(subesc or 0)+(supra or 0)); logS = math.log10(S)
+    key = "F" if sex.lower().startswith("f") else "M"
+    coeff = None
+    for up, ab in DW[key]:
+        if age<=up: coeff = ab; break
+    if coeff is None: coeff = DW[key][-1][1]
+    a, b = coeff; return a - (b*logS)
+
+def siri_pctfat(d): return round(((4.95/d)-4.50)*100,1)
+
 def macros(kcal, pct_prot, pct_fat, pct_cho, weight_kg, pct_cho_complex=85, fat_split=(10,35,55)):
     # Normalizar porcentajes
     total = pct_prot + pct_fat + pct_cho
@@ -45,6 +75,9 @@ def bmi(weight_kg, height_cm):
     h = max(1e-6, height_cm/100)
     return round(weight_kg/(h*h),2)
 
+def whr(waist_cm, hip_cm): return round(waist_cm/hip_cm,2) if waist_cm and hip_cm else None
+def whtr(waist_cm, height_cm): return round(waist_cm/height_cm,2) if waist_cm and height_cm else None
+
 def homa_ir(glucose_mg_dl, insulin_uU_ml):
     if glucose_mg_dl>0 and insulin_uU_ml>0:
         g_mmol = glucose_mg_dl/18.0
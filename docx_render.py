@@ -0,0 +1,137 @@
+# docx_render.py — Render DOCX por plantilla compilada.
+# python-docx se usa una sola vez (al compilar) para producir un documento prototipo con marcadores;
+# de ahí salen los fragmentos XML de cada tipo de bloque y el resto de partes del paquete ya comprimidas.
+# Por documento solo se concatenan fragmentos con los valores escapados y se añade word/document.xml al zip.
+import re
+import zipfile
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+_MARK = "⟦B:{}⟧"
+_SLOT = "⟦{}⟧"
+_BLOCK_RE = re.compile(r"<w:p><w:r><w:t>⟦B:(\w+)⟧</w:t></w:r></w:p>")
+# Run con texto de prueba: (rPr opcional, índice del hueco)
+_RUN_RE = re.compile(r"<w:r>(<w:rPr>.*?</w:rPr>)?<w:t>⟦(\d+)⟧</w:t></w:r>")
+# Caracteres fuera del rango Char de XML 1.0 (controles, sustitutos sueltos): se descartan del texto libre
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+def _run_content(text):
+    # Igual que el setter run.text de python-docx: \t → <w:tab/>, \n/\r → <w:br/>, resto en <w:t>
+    out = []
+    for i, seg in enumerate(re.split(r"([\t\r\n])", _INVALID_XML.sub("", text))):
+        if i % 2:
+            out.append("<w:tab/>" if seg == "\t" else "<w:br/>")
+        elif seg:
+            pre = ' xml:space="preserve"' if len(seg.strip()) < len(seg) else ""
+            out.append(f"<w:t{pre}>{escape(seg)}</w:t>")
+    return "".join(out)
+
+class _Fragment:
+    """Fragmento XML compilado: partes estáticas alternadas con huecos (rPr, índice)."""
+    def __init__(self, xml, optional_run=False):
+        self.parts, pos = [], 0
+        for m in _RUN_RE.finditer(xml):
+            self.parts.append(xml[pos:m.start()]); self.parts.append((m.group(1) or "", int(m.group(2))))
+            pos = m.end()
+        self.parts.append(xml[pos:])
+        self.optional_run = optional_run   # add_paragraph("") no crea run; cell.text = "" sí
+
+    def render(self, values):
+        out = []
+        for part in self.parts:
+            if isinstance(part, str): out.append(part); continue
+            rpr, i = part; text = values[i]
+            if not text and self.optional_run: continue
+            body = rpr + _run_content(text)
+            out.append(f"<w:r>{body}</w:r>" if body else "<w:r/>")
+        return "".join(out).replace("<w:p></w:p>", "<w:p/>")
+
+class DocxTemplate:
+    """Plantilla (la de python-docx o un .docx de marca) compilada a fragmentos XML.
+
+    Bloques que acepta render():
+        ("h", texto, nivel)            → doc.add_heading(texto, nivel)
+        ("p", texto)                   → doc.add_paragraph(texto)
+        ("p_bold", texto)              → doc.add_paragraph(texto).runs[0].bold = True
+        ("p_indent0", texto)           → doc.add_paragraph(texto).paragraph_format.left_indent = 0
+        ("table", encabezado, filas)   → doc.add_table(rows=1, cols=n) + add_row() por fila
+        ("kv_table", pares)            → tabla de 2 columnas sin encabezado, 1ª columna en negrita
+    """
+    def __init__(self, path=None, font=("Calibri", 11)):
+        self.path, self.font = path, font
+        self._blocks, self._tables = {}, {}
+        proto = self._prototype(lambda doc: [
+            self._mark(doc, "p", lambda: doc.add_paragraph(_SLOT.format(0))),
+            self._mark(doc, "p_bold", lambda: setattr(doc.add_paragraph(_SLOT.format(0)).runs[0], "bold", True)),
+            self._mark(doc, "p_indent0", lambda: setattr(doc.add_paragraph(_SLOT.format(0)).paragraph_format, "left_indent", 0)),
+            *(self._mark(doc, f"h{lvl}", lambda lvl=lvl: doc.add_heading(_SLOT.format(0), lvl)) for lvl in range(10)),
+        ])
+        xml, files = proto
+        head, *chunks = _BLOCK_RE.split(xml)
+        self._head, self._tail = head, None
+        for name, frag in zip(chunks[::2], chunks[1::2]):
+            if name == "end": self._tail = frag; continue
+            self._blocks[name] = _Fragment(frag, optional_run=True)
+        # Partes fijas del paquete comprimidas una sola vez; document.xml se añade en cada render
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+            for name, data in files:
+                if name != "word/document.xml": z.writestr(name, data)
+        self._static = buf.getvalue()
+
+    def _new_doc(self):
+        from docx import Document
+        from docx.shared import Pt
+        doc = Document(self.path)
+        style = doc.styles["Normal"]; style.font.name = self.font[0]; style.font.size = Pt(self.font[1])
+        return doc
+
+    def _mark(self, doc, name, add):
+        doc.add_paragraph(_MARK.format(name)); add()
+
+    def _prototype(self, build):
+        doc = self._new_doc(); build(doc); doc.add_paragraph(_MARK.format("end"))
+        bio = BytesIO(); doc.save(bio)
+        with zipfile.ZipFile(bio) as z:
+            files = [(i.filename, z.read(i.filename)) for i in z.infolist()]
+        return dict(files)["word/document.xml"].decode("utf-8"), files
+
+    def _table(self, ncols):
+        # Cabecera/filas de tabla según número de columnas (anchos calculados por python-docx)
+        if ncols not in self._tables:
+            def build(doc):
+                doc.add_paragraph(_MARK.format("tbl"))
+                t = doc.add_table(rows=1, cols=ncols)
+                for i, c in enumerate(t.rows[0].cells): c.text = _SLOT.format(i)
+                for i, c in enumerate(t.add_row().cells): c.text = _SLOT.format(i)
+                r = t.add_row().cells
+                for i, c in enumerate(r): c.text = _SLOT.format(i)
+                r[0].paragraphs[0].runs[0].bold = True
+            xml = _BLOCK_RE.split(self._prototype(build)[0])[2]
+            rows = re.findall(r"<w:tr>.*?</w:tr>", xml)
+            self._tables[ncols] = (xml[:xml.index("<w:tr>")], _Fragment(rows[1]), _Fragment(rows[2]),
+                                   xml[xml.rindex("</w:tr>")+len("</w:tr>"):])
+        return self._tables[ncols]
+
+    def _render_block(self, b):
+        kind = b[0]
+        if kind == "h": return self._blocks[f"h{b[2]}"].render([b[1]])
+        if kind in ("p", "p_bold", "p_indent0"): return self._blocks[kind].render([b[1]])
+        if kind == "table":
+            header, rows = b[1], b[2]
+            head, row, _, tail = self._table(len(header))
+            return head + "".join(row.render([str(v) for v in r]) for r in [header, *rows]) + tail
+        if kind == "kv_table":
+            head, _, bold_row, tail = self._table(2)
+            # add_table(rows=0) + add_row(): mismo XML que las filas del prototipo
+            return head + "".join(bold_row.render([str(k), str(v)]) for k, v in b[1]) + tail
+        raise ValueError(f"Bloque DOCX desconocido: {kind}")
+
+    def render_xml(self, blocks):
+        return self._head + "".join(self._render_block(b) for b in blocks) + self._tail
+
+    def render(self, blocks):
+        bio = BytesIO(self._static); bio.seek(0, 2)
+        with zipfile.ZipFile(bio, "a", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("word/document.xml", self.render_xml(blocks))
+        bio.seek(0); return bio
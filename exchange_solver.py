@@ -0,0 +1,163 @@
+# exchange_solver.py — Raciones enteras por grupo que mejor cumplen kcal y gramos de PRO/FAT/CHO.
+# El solver enumera todas las combinaciones dentro de BOUNDS y elige la de menor desviación; como las
+# entradas posibles son pocas (kcal de 10 en 10 × presets de %), las soluciones se precalculan en
+# exchange_plans.npz y en la app solo se indexa la tabla. Fuera de la rejilla (kcal < 1000 o > 4000, % que
+# no son múltiplos de 5) se busca alrededor de la entrada más cercana (ver refine): la enumeración completa
+# (~2,8 M combinaciones, ~600 MB) solo se construye al regenerar la tabla o si falta.
+#
+#   python exchange_solver.py            # regenera exchange_plans.npz tras cambiar EXCHANGES o BOUNDS
+import hashlib
+import json
+import os
+import sys
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from clinical_calc import macros
+from exchanges_catalog import BASE_EXCHANGES, EXCHANGES
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exchange_plans.npz")
+
+# Raciones/día mínimas y máximas por grupo
+BOUNDS = {"Vegetales":(3,8),"Frutas":(1,6),"Cereales":(2,20),"Leguminosas":(0,4),
+          "Lácteos descremados":(0,3),"Proteínas magras":(2,14),"Grasas saludables":(1,16)}
+GROUPS = tuple(BOUNDS)
+# Patrón de referencia (≈2000 kcal): solo desempata entre soluciones con macros casi iguales
+PATTERN = BASE_EXCHANGES
+W_PATTERN = 0.002
+KCAL_WINDOW = 0.05   # solo se evalúan combinaciones a ±5 % de las kcal objetivo
+
+# Rejilla precalculada: kcal 1000–4000 de 10 en 10; % proteína y % grasa de 5 en 5 (sliders de la app)
+KCAL_RANGE = (1000, 4000, 10)
+PROT_PRESETS = tuple(range(10, 36, 5))
+FAT_PRESETS = tuple(range(20, 41, 5))
+RADIUS = 2   # vecindario de refine(): ±2 raciones por grupo (5**7 ≈ 78 k combinaciones por paso)
+
+def _signature():
+    # Si cambian el catálogo, los límites o la rejilla, la tabla guardada deja de valer
+    src = json.dumps([[EXCHANGES[g][m] for m in ("kcal","PRO","FAT","CHO")] for g in GROUPS]
+                     + [BOUNDS, PATTERN, W_PATTERN, KCAL_WINDOW, KCAL_RANGE, PROT_PRESETS, FAT_PRESETS], ensure_ascii=False)
+    return hashlib.sha256(src.encode("utf-8")).hexdigest()[:16]
+
+class _Combos:
+    """Todas las combinaciones enteras dentro de BOUNDS, ordenadas por kcal."""
+    def __init__(self):
+        grids = np.meshgrid(*[np.arange(lo, hi+1, dtype=np.int16) for lo, hi in BOUNDS.values()], indexing="ij")
+        n = np.stack([g.ravel() for g in grids], axis=1)
+        per = np.array([[EXCHANGES[g][m] for m in ("kcal","PRO","FAT","CHO")] for g in GROUPS], dtype=np.int32)
+        tot = n.astype(np.int32) @ per
+        order = np.argsort(tot[:, 0], kind="stable")
+        self.n, self.kcal = n[order], tot[order, 0]
+        self.tot = tot[order, 1:].astype(np.float64)
+        self.nf = self.n.astype(np.float64); self.n2 = self.nf * self.nf
+
+    def solve(self, kcal, pct_prot, pct_fat):
+        lo, hi = np.searchsorted(self.kcal, [kcal*(1-KCAL_WINDOW), kcal*(1+KCAL_WINDOW)], side="left")
+        if lo == hi:   # objetivo fuera de lo alcanzable: se evalúan todas
+            lo, hi = 0, len(self.kcal)
+        i = _argmin(self.kcal[lo:hi], self.tot[lo:hi], self.nf[lo:hi], self.n2[lo:hi], kcal, pct_prot, pct_fat)
+        return self.n[lo + i]
+
+_PER = np.array([[EXCHANGES[g][m] for m in ("kcal","PRO","FAT","CHO")] for g in GROUPS], dtype=np.int32)
+_PATTERN = np.array([PATTERN[g] for g in GROUPS], dtype=np.float64)
+_LO, _HI = (np.array(b, dtype=np.int16) for b in zip(*BOUNDS.values()))
+
+def _argmin(kcals, tot, nf, n2, kcal, pct_prot, pct_fat):
+    # Desviación relativa al cuadrado en kcal y en cada macro + desempate por patrón de referencia;
+    # Σ w·(n - ref)² se desarrolla como n²·w - 2·n·(w·ref) (la constante no cambia el argmin)
+    g = macros(kcal, pct_prot, pct_fat, 100 - pct_prot - pct_fat, 0)["g"]
+    target = np.array([g["prot"], g["fat"], g["cho"]])
+    cost = ((kcals - kcal) / kcal) ** 2
+    cost += (((tot - target) / np.maximum(target, 1.0)) ** 2).sum(axis=1)
+    ref = _PATTERN * (kcal / 2000); w = W_PATTERN / (ref + 1) ** 2
+    cost += n2 @ w - nf @ (2 * w * ref)
+    return int(np.argmin(cost))
+
+@lru_cache(maxsize=1)
+def _offsets():
+    return np.stack(np.meshgrid(*[np.arange(-RADIUS, RADIUS+1, dtype=np.int16)] * len(GROUPS), indexing="ij"), -1).reshape(-1, len(GROUPS))
+
+def refine(start, kcal, pct_prot, pct_fat, max_steps=20):
+    """Mejor combinación en el vecindario de `start` (±RADIUS por grupo, dentro de BOUNDS), repetido
+    desde la nueva mejor hasta que no cambia. Mismo criterio que solve() sin enumerar todo BOUNDS."""
+    best = np.asarray(start, dtype=np.int16)
+    for _ in range(max_steps):
+        n = np.clip(best + _offsets(), _LO, _HI)   # repetidas en los bordes: no cambian el argmin
+        tot = n.astype(np.int32) @ _PER
+        sel = np.flatnonzero(np.abs(tot[:, 0] - kcal) <= kcal*KCAL_WINDOW)
+        if len(sel):
+            nf = n[sel].astype(np.float64)
+            new = n[sel[_argmin(tot[sel, 0], tot[sel, 1:].astype(np.float64), nf, nf*nf, kcal, pct_prot, pct_fat)]]
+        else:   # la ventana de kcal aún no está al alcance: se avanza hacia ella
+            new = n[int(np.argmin(np.abs(tot[:, 0] - kcal)))]
+        if (new == best).all(): break
+        best = new
+    return best
+
+@lru_cache(maxsize=1)
+def _combos(): return _Combos()
+
+@lru_cache(maxsize=4096)
+def solve(kcal, pct_prot=20, pct_fat=30):
+    """Raciones/día por grupo (enteras, dentro de BOUNDS) para kcal y % de proteína/grasa dados."""
+    return dict(zip(GROUPS, _combos().solve(kcal, pct_prot, pct_fat).tolist()))
+
+def build_table(path=TABLE_PATH, log=sys.stderr):
+    c = _combos()
+    kcals = np.arange(KCAL_RANGE[0], KCAL_RANGE[1] + 1, KCAL_RANGE[2])
+    plans = np.zeros((len(PROT_PRESETS), len(FAT_PRESETS), len(kcals), len(GROUPS)), dtype=np.uint8)
+    t0 = time.perf_counter()
+    for i, p in enumerate(PROT_PRESETS):
+        for j, f in enumerate(FAT_PRESETS):
+            for k, kcal in enumerate(kcals): plans[i, j, k] = c.solve(int(kcal), p, f)
+        if log: print(f"\r{i+1}/{len(PROT_PRESETS)} presets de proteína · {time.perf_counter()-t0:.0f} s", end="", file=log)
+    np.savez_compressed(path, plans=plans, signature=np.array(_signature()))
+    if log: print(f"\n{plans.size:,} raciones → {os.path.getsize(path):,} bytes en {path}", file=log)
+    return plans
+
+class _Table:
+    def __init__(self, path=TABLE_PATH):
+        self.plans = None
+        try:
+            with np.load(path) as z:
+                if str(z["signature"]) == _signature(): self.plans = z["plans"]
+        except (OSError, KeyError, ValueError):
+            pass
+        self.prot = {p: i for i, p in enumerate(PROT_PRESETS)}
+        self.fat = {f: i for i, f in enumerate(FAT_PRESETS)}
+
+    def get(self, kcal, pct_prot, pct_fat):
+        # None si la combinación no está precalculada (o la tabla no existe / está desactualizada)
+        i, j = self.prot.get(pct_prot), self.fat.get(pct_fat)
+        k0, k1, step = KCAL_RANGE
+        if self.plans is None or i is None or j is None or not k0 <= kcal <= k1 or kcal % step: return None
+        return self.plans[i, j, (kcal - k0) // step]
+
+@lru_cache(maxsize=1)
+def table(): return _Table()
+
+def _nearest(value, presets):
+    return min(presets, key=lambda p: (abs(p - value), p))
+
+@lru_cache(maxsize=4096)
+def _off_grid(kcal, pct_prot, pct_fat):
+    # Punto de partida: la entrada de la tabla más cercana (kcal acotadas, % al preset más próximo)
+    k0, k1, _ = KCAL_RANGE
+    start = table().get(min(k1, max(k0, kcal)), _nearest(pct_prot, PROT_PRESETS), _nearest(pct_fat, FAT_PRESETS))
+    if start is None: return solve(kcal, pct_prot, pct_fat)
+    return dict(zip(GROUPS, refine(start, kcal, pct_prot, pct_fat).tolist()))
+
+def plan_for(kcal, pct_prot=20, pct_fat=30):
+    """Raciones/día por grupo para kcal (redondeadas a 10) y los % pedidos: de la tabla si están en la
+    rejilla; si no, refinando la entrada más cercana (sin la enumeración completa)."""
+    if not kcal or kcal <= 0: return {g: 0 for g in GROUPS}
+    kcal = int(round(kcal / 10)) * 10
+    pct_prot, pct_fat = int(pct_prot), int(pct_fat)
+    row = table().get(kcal, pct_prot, pct_fat)
+    if row is None: return dict(_off_grid(kcal, pct_prot, pct_fat))
+    return dict(zip(GROUPS, row.tolist()))
+
+if __name__ == "__main__":
+    build_table()
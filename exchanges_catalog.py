@@ -18,3 +18,18 @@ SUBS = {
     "plátano (1/2 unid med.)": {"kcal":60,"CHO":15,"PRO":1,"FAT":0,"equiv":"≈1 interc. Frutas"}
   }
 }
+
+# Raciones de referencia (≈2000 kcal; ver exchange_solver) y reparto por tiempo de comida
+BASE_EXCHANGES = {"Vegetales":4,"Frutas":2,"Cereales":5,"Leguminosas":1,"Lácteos descremados":1,"Proteínas magras":4,"Grasas saludables":4}
+MEAL_SPLIT = {"Desayuno":0.25,"Merienda AM":0.10,"Almuerzo":0.30,"Merienda PM":0.10,"Cena":0.25}
+
+def exchanges_from_kcal(k, pct_prot=20, pct_fat=30):
+    # Raciones enteras que mejor cumplen kcal y gramos de macros (tabla precalculada de exchange_solver)
+    from exchange_solver import plan_for
+    return plan_for(k, pct_prot, pct_fat)
+
+def distribute_by_meal(d):
+    out={m:{} for m in MEAL_SPLIT}
+    for g,tot in d.items():
+        for m,fr in MEAL_SPLIT.items(): out[m][g]=round(tot*fr,1)
+    return out
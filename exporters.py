@@ -1,13 +1,26 @@
-import json
-from datetime import date
-from io import BytesIO
-try:
-    from docx import Document
-    from docx.shared import Pt
-    DOCX = True
-except Exception:
-    DOCX = False
+import os
+from importlib.util import find_spec
 
+from docx_render import DocxTemplate
+import perf
+
+# python-docx (y menu_engine → food_db → numpy) se importan al generar el primer documento, no al cargar
+# el módulo: la app y la API solo necesitan saber si está instalado
+DOCX = find_spec("docx") is not None
+
+BRAND_NAME = "@nutritionsays"
+# Plantilla .docx de marca (opcional); sin ella se usa la plantilla por defecto de python-docx
+DOCX_TEMPLATE = os.environ.get("NUTRI_DOCX_TEMPLATE") or None
+
+_TEMPLATE = None
+
+def docx_template():
+    # La plantilla se compila una sola vez por proceso; cada documento solo concatena XML
+    global _TEMPLATE
+    if _TEMPLATE is None: _TEMPLATE = DocxTemplate(DOCX_TEMPLATE)
+    return _TEMPLATE
+
+@perf.timed("export.fhir_order")
 def fhir_nutrition_order(payload):
     # Simplificado (válido para pruebas / PoC)
     return {
@@ -32,6 +45,7 @@ def fhir_nutrition_order(payload):
       "supplement":[{"productName": s} for s in payload["nutrition_order"].get("supplements",[])]
     }
 
+@perf.timed("export.fhir_intake")
 def fhir_nutrition_intake(payload):
     return {
       "resourceType":"NutritionIntake",
@@ -50,30 +64,148 @@ def fhir_nutrition_intake(payload):
       "recorded":{"value": payload["fecha"]}
     }
 
+@perf.timed("export.docx_note")
 def build_docx_note(kind, payload):
     if not DOCX: return None
-    doc = Document()
-    style = doc.styles["Normal"]; style.font.name = "Calibri"; style.font.size = Pt(11)
-    doc.add_heading(f"HISTORIA CLÍNICA NUTRICIONAL – {kind.upper()}", level=1)
-    doc.add_paragraph(f"Fecha: {payload['fecha']}   Profesional: {payload['profesional']}   Paciente: {payload['paciente']}")
-    doc.add_heading("Evaluación (A)", level=2)
-    doc.add_paragraph(payload["evaluation"])
-    doc.add_heading("Diagnóstico (D)", level=2)
+    b = [("h", f"HISTORIA CLÍNICA NUTRICIONAL – {kind.upper()}", 1)]
+    b.append(("p", f"Fecha: {payload['fecha']}   Profesional: {payload['profesional']}   Paciente: {payload['paciente']}"))
+    b.append(("h", "Evaluación (A)", 2))
+    b.append(("p", payload["evaluation"]))
+    b.append(("h", "Diagnóstico (D)", 2))
     for pes in payload["pes_list"]:
-        doc.add_paragraph(f"- {pes}")
-    doc.add_heading("Intervención (I)", level=2)
-    doc.add_paragraph(payload["prescription"])
-    doc.add_heading("Monitoreo/Evaluación (ME)", level=2)
-    doc.add_paragraph(payload["monitoring"])
+        b.append(("p", f"- {pes}"))
+    b.append(("h", "Intervención (I)", 2))
+    b.append(("p", payload["prescription"]))
+    b.append(("h", "Monitoreo/Evaluación (ME)", 2))
+    b.append(("p", payload["monitoring"]))
     # Requerimientos
-    doc.add_heading("Requerimientos", level=2)
+    b.append(("h", "Requerimientos", 2))
     m = payload["macros"]
-    doc.add_paragraph(f"Energía: {payload['kcal']} kcal/d  ({payload['kcal_kg']} kcal/kg)")
-    doc.add_paragraph(f"Proteínas: {m['pct']['prot']}% → {m['g']['prot']} g ({payload['gkg_prot']} g/kg)")
-    doc.add_paragraph(f"Grasas: {m['pct']['fat']}% → {m['g']['fat']} g (Sat {m['g']['sat']} g, Poli {m['g']['poli']} g, Mono {m['g']['mono']} g)")
-    doc.add_paragraph(f"CHO: {m['pct']['cho']}% → {m['g']['cho']} g (Complejos {m['g']['cho_c']} g, Simples {m['g']['cho_s']} g)")
+    b.append(("p", f"Energía: {payload['kcal']} kcal/d  ({payload['kcal_kg']} kcal/kg)"))
+    b.append(("p", f"Proteínas: {m['pct']['prot']}% → {m['g']['prot']} g ({payload['gkg_prot']} g/kg)"))
+    b.append(("p", f"Grasas: {m['pct']['fat']}% → {m['g']['fat']} g (Sat {m['g']['sat']} g, Poli {m['g']['poli']} g, Mono {m['g']['mono']} g)"))
+    b.append(("p", f"CHO: {m['pct']['cho']}% → {m['g']['cho']} g (Complejos {m['g']['cho_c']} g, Simples {m['g']['cho_s']} g)"))
     # Sodio
     s = payload["sodium"]
-    doc.add_paragraph(f"Sodio objetivo: {s['target_mg']} mg; Consumido: {s['current_mg']} mg; Remanente: {s['remaining_mg']} mg")
-    doc.add_paragraph(f"≈ {s['salt_g']} g NaCl ( {s['tsp']} cdtas )")
-    bio = BytesIO(); doc.save(bio); bio.seek(0); return bio
+    b.append(("p", f"Sodio objetivo: {s['target_mg']} mg; Consumido: {s['current_mg']} mg; Remanente: {s['remaining_mg']} mg"))
+    b.append(("p", f"≈ {s['salt_g']} g NaCl ( {s['tsp']} cdtas )"))
+    return docx_template().render(b)
+
+# ====== EXPORTADOR: Plan de alimentación estilo @nutritionsays ======
+def _mk_kv_table(pairs):
+    # Tabla clave/valor, primera columna en negrita
+    return ("kv_table", [(str(k), str(v)) for k, v in pairs])
+
+def _dist_table(by_meal, daily):
+    cols = ["Lista","Desayuno","Merienda AM","Almuerzo","Merienda PM","Cena","Total"]
+    rows = []
+    for g in daily.keys():
+        r = [g]
+        tot = 0.0
+        for m in ["Desayuno","Merienda AM","Almuerzo","Merienda PM","Cena"]:
+            val = by_meal.get(m,{}).get(g,0)
+            r.append(str(val)); tot += float(val)
+        r.append(str(round(tot,1)))
+        rows.append(r)
+    return ("table", cols, rows)
+
+@perf.timed("export.docx_plan")
+def build_docx_plan_nutritionsays(payload, daily, by_meal):
+    """
+    Crea un DOCX editable con la estructura del PDF 'Plan de alimentación y recomendaciones nutricionales'
+    adaptado a los datos de la consulta.
+    """
+    if not DOCX: return None
+    b = []
+    # Portada / encabezado
+    b.append(("h", "Plan de alimentación y recomendaciones nutricionales", 0))
+    b.append(("p", "Comienza tu plan nutricional nutritivo y variado"))
+    b.append(("p_bold", payload["paciente"]))
+
+    # Diagnóstico nutricional (resumen)
+    b.append(("h", "Diagnóstico nutricional", 1))
+    diag = payload["diagnostico"].strip() or "—"
+    b.append(("p", diag))
+
+    # Datos antropométricos
+    b.append(("h", "Datos antropométricos", 1))
+    pares = [
+        ("Peso actual", f"{payload['peso']} kg"),
+        ("Talla", f"{payload['talla_m']} m"),
+        ("IMC", f"{payload['imc']} kg/m²"),
+        ("Circ. Cintura", f"{payload.get('cintura','—')} cm"),
+        ("Circ. Cadera", f"{payload.get('cadera','—')} cm"),
+        ("Índice cintura/cadera", payload.get("whr","—")),
+        ("Índice cintura/talla", payload.get("whtr","—")),
+        ("% Grasa (pliegues/BIA)", payload.get("bf_txt","—")),
+        ("Peso usual", payload.get("peso_usual","—")),
+        ("Peso máx", payload.get("peso_max","—")),
+        ("Peso mín", payload.get("peso_min","—")),
+    ]
+    b.append(_mk_kv_table(pares))
+
+    # Características del plan
+    b.append(("h", "Características del plan de alimentación", 1))
+    bullets = [
+        f"Número de comidas: {payload['comidas']} (3 principales y {max(0,payload['comidas']-3)} meriendas)",
+        f"Calorías a consumir: {payload['kcal']} Kcal/d",
+        f"Cantidad de proteínas: {payload['prot_gkg']} g/kg (≈ {payload['macros']['g']['prot']} g/d)",
+        f"Cantidad de sal: {round(payload['sodium']['salt_g'],2)} g NaCl/d (≈ {payload['sodium']['tsp']} cdtas)",
+        f"Cantidad de agua: {payload['agua_l']} L/día",
+        f"Objetivo: {payload['objetivo']}",
+    ]
+    if payload["otras"]: bullets.append(f"Otras: {payload['otras']}")
+    for t in bullets: b.append(("p_indent0", t))
+
+    # Listas de intercambios — raciones totales
+    b.append(("h", "Listas de intercambios – raciones totales diarias", 1))
+    cat = payload["catalog"]
+    b.append(("table", ["Lista","Raciones","kcal/rac","CHO","PRO","FAT","Porción ref."],
+              [[g, r, cat[g]["kcal"], cat[g]["CHO"], cat[g]["PRO"], cat[g]["FAT"], cat[g]["portion"]] for g, r in daily.items()]))
+
+    # Distribución por tiempos
+    b.append(("h", "Distribución de intercambios / raciones", 1))
+    b.append(_dist_table(by_meal, daily))
+
+    # Menú de N días (menu_engine): preferencias y exclusiones del payload si vienen
+    dias = payload.get("menu_days", 7)
+    import menu_engine
+    # Exclusiones de la orden nutricional (como en el recurso FHIR); "exclusions" en la raíz las reemplaza
+    exclusions = payload.get("exclusions", payload.get("nutrition_order", {}).get("exclusions", ()))
+    menu = menu_engine.menu(by_meal, dias, payload.get("preferences"), exclusions)
+    b.append(("h", f"Plan de alimentación – Menú ({len(next(iter(menu.values())))} días)", 1))
+    for d in next(iter(menu.values())):
+        b.append(("p_bold", d))
+        for m, por_dia in menu.items(): b.append(("p", f"{m}: {por_dia[d]}"))
+
+    # Recomendaciones (resumen editado)
+    b.append(("h", "Recomendaciones para ti", 1))
+    recs = [
+        "Consumir ≥5 raciones entre frutas y vegetales/día; preferir frutas enteras y vegetales frescos o cocidos.",
+        "Preferir proteínas magras (pollo sin piel, pescados, atún al agua, huevos); limitar carnes rojas y embutidos (1–2 veces/sem).",
+        "Priorizar grasas mono y poliinsaturadas (aguacate, aceite de oliva/maíz, semillas); limitar saturadas y frituras.",
+        "Evitar bebidas azucaradas y ultraprocesados; si consumes dulces, que sea ocasional y en porciones pequeñas.",
+        "Usar 1/4 cdita (≈1 g) de sal distribuida en el día; preferir especias y condimentos naturales.",
+        "Hidratación: beber ~{:.1f} vasos/día (240 ml c/u).".format(payload['agua_l']*1000/240),
+        "Actividad física de fortalecimiento 3–5 d/sem; cardio suave 1–2 d/sem según tolerancia.",
+        "Dormir 7–8 h y practicar manejo de estrés (respiración, pausas activas)."
+    ]
+    for r in recs: b.append(("p", "• " + r))
+
+    # Marca
+    b.append(("p", ""))
+    b.append(("p_bold", BRAND_NAME))
+
+    return docx_template().render(b)
+
+@perf.timed("export.docx_plan_simple")
+def build_docx_plan_simple(paciente, mb, tee, kcal, daily, fecha, catalog, brand=BRAND_NAME):
+    # Plan resumido que descarga la app (encabezado + tabla de raciones)
+    if not DOCX: return None
+    return docx_template().render([
+        ("h", "Plan de alimentación – " + brand, 0),
+        ("p", f"Paciente: {paciente}  |  Fecha: {fecha}"),
+        ("p", f"MB: {mb} kcal  |  TEE: {tee} kcal  |  Meta: {kcal} kcal"),
+        ("table", ["Lista","Raciones","kcal","CHO","PRO","FAT","Porción"],
+         [[g, r, catalog[g]["kcal"], catalog[g]["CHO"], catalog[g]["PRO"], catalog[g]["FAT"], catalog[g]["portion"]] for g, r in daily.items()]),
+    ])
@@ -0,0 +1,107 @@
+# fhir_bulk.py — Exportación FHIR Bulk Data: NDJSON comprimido (gzip), un recurso por línea,
+# un archivo por tipo de recurso con rotación por tamaño y manifiesto de la exportación.
+#
+#   python fhir_bulk.py payloads.jsonl salida/ --max-mb 64 --base-url https://ehr.example/bulk/
+#
+# Cada línea de payloads.jsonl es el payload que reciben exporters.fhir_nutrition_order/_intake.
+import argparse
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+# orjson opcional (serialización ~10x más rápida); si no está, json de la stdlib
+try:
+    import orjson
+    _dumps = orjson.dumps
+except Exception:
+    _dumps = lambda obj, _enc=json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode: _enc(obj).encode("utf-8")
+
+from exporters import fhir_nutrition_order, fhir_nutrition_intake
+
+RESOURCES = {"NutritionOrder": fhir_nutrition_order, "NutritionIntake": fhir_nutrition_intake}
+
+class _TypeWriter:
+    """Archivos <Tipo>.<n>.ndjson.gz de un tipo de recurso; abre uno nuevo al superar max_bytes."""
+    def __init__(self, outdir, rtype, max_bytes, level):
+        self.outdir, self.rtype, self.max_bytes, self.level = outdir, rtype, max_bytes, level
+        self.files = []   # [(nombre, recursos)]
+        self._raw = self._gz = None
+        self._buf, self._buf_len = [], 0
+
+    def _open(self):
+        name = f"{self.rtype}.{len(self.files)+1:03d}.ndjson.gz"
+        self._raw = open(os.path.join(self.outdir, name), "wb")
+        self._gz = gzip.GzipFile(filename="", mode="wb", fileobj=self._raw, compresslevel=self.level, mtime=0)
+        self.files.append([name, 0])
+
+    def write(self, line):
+        # Tamaño medido en bytes comprimidos ya escritos (el compresor retiene un búfer pequeño)
+        if self._gz is None or (self.files[-1][1] and self._raw.tell() >= self.max_bytes):
+            self.close(); self._open()
+        self._buf.append(line); self._buf_len += len(line); self.files[-1][1] += 1
+        if self._buf_len >= 256*1024: self._flush()
+
+    def _flush(self):
+        # Se comprime por bloques de ~256 KB en lugar de línea a línea
+        self._gz.write(b"".join(self._buf)); self._buf.clear(); self._buf_len = 0
+
+    def close(self):
+        if self._gz is not None:
+            self._flush(); self._gz.close(); self._raw.close(); self._gz = self._raw = None
+
+def export_ndjson(payloads, outdir, max_bytes=64*1024*1024, base_url=None, request_url="$export",
+                  types=tuple(RESOURCES), level=6):
+    """Escribe los recursos de `payloads` (cualquier iterable/generador) sin materializar listas.
+
+    Devuelve el manifiesto (también escrito en outdir/manifest.json). Los payloads que no se
+    pueden convertir quedan como OperationOutcome en el archivo de errores del manifiesto.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    started = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    writers = {t: _TypeWriter(outdir, t, max_bytes, level) for t in types}
+    errors = _TypeWriter(outdir, "OperationOutcome", max_bytes, level)
+    try:
+        for i, payload in enumerate(payloads):
+            for t in types:
+                try:
+                    line = _dumps(RESOURCES[t](payload))
+                except Exception as e:
+                    line = _dumps({"resourceType": "OperationOutcome", "issue": [{
+                        "severity": "error", "code": "processing",
+                        "diagnostics": f"payload {i} ({t}): {type(e).__name__}: {e}"}]})
+                    errors.write(line + b"\n"); continue
+                writers[t].write(line + b"\n")
+    finally:
+        for w in (*writers.values(), errors): w.close()
+
+    def url(name): return (base_url.rstrip("/") + "/" + name) if base_url else os.path.abspath(os.path.join(outdir, name))
+    manifest = {
+        "transactionTime": started,
+        "request": request_url,
+        "requiresAccessToken": bool(base_url),
+        "output": [{"type": w.rtype, "url": url(n), "count": c} for w in writers.values() for n, c in w.files],
+        "error": [{"type": "OperationOutcome", "url": url(n), "count": c} for n, c in errors.files],
+    }
+    with open(os.path.join(outdir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+def read_payloads(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip(): yield json.loads(line)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Exporta NutritionOrder/NutritionIntake en formato FHIR Bulk Data.")
+    ap.add_argument("payloads", help="JSONL de payloads de consulta")
+    ap.add_argument("salida", help="Directorio de salida")
+    ap.add_argument("--max-mb", type=float, default=64, help="Tamaño máximo (comprimido) por archivo")
+    ap.add_argument("--base-url", default=None, help="URL base donde se publicarán los archivos")
+    a = ap.parse_args(argv)
+    m = export_ndjson(read_payloads(a.payloads), a.salida, int(a.max_mb*1024*1024), a.base_url)
+    for o in m["output"] + m["error"]: print(f"{o['type']:<16} {o['count']:>10}  {o['url']}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
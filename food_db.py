@@ -0,0 +1,208 @@
+# food_db.py — Base de composición de alimentos (kcal/CHO/PRO/FAT por porción) con dos índices:
+#   · KD-tree sobre el vector de macros → equivalentes a N intercambios de un grupo (±tolerancia)
+#   · índice de prefijos sin acentos sobre las palabras del nombre ("platano" → "plátano")
+# Formato en disco: .npz con las macros en float32 y los textos como un bloque UTF-8 + offsets.
+#
+#   python food_db.py build alimentos.csv foods.npz     # columnas: name,group,portion,kcal,CHO,PRO,FAT
+#   python food_db.py equiv foods.npz Cereales
+#   python food_db.py search foods.npz platano
+import bisect
+import csv
+import heapq
+import os
+import sys
+import unicodedata
+
+import numpy as np
+
+from exchanges_catalog import EXCHANGES, SUBS
+
+FOODS_PATH = os.environ.get("NUTRI_FOODS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "foods.npz"))
+MACROS = ("kcal", "CHO", "PRO", "FAT")
+# Holgura absoluta por macro además de la relativa: un intercambio con 0 g de PRO admite ±1 g
+ABS_TOL = np.array([5.0, 1.0, 1.0, 1.0], dtype=np.float32)
+
+def fold(text):
+    # minúsculas y sin acentos/diacríticos (NFKD sin marcas combinantes)
+    return "".join(c for c in unicodedata.normalize("NFKD", str(text).lower()) if not unicodedata.combining(c))
+
+def tokens(text):
+    return [w for w in "".join(c if c.isalnum() else " " for c in fold(text)).split() if w]
+
+def _pack(strings):
+    data = [s.encode("utf-8") for s in strings]
+    off = np.zeros(len(data) + 1, dtype=np.uint32); off[1:] = np.cumsum([len(b) for b in data])
+    return np.frombuffer(b"".join(data), dtype=np.uint8), off
+
+def _unpack(blob, off):
+    raw = blob.tobytes()
+    return [raw[off[i]:off[i+1]].decode("utf-8") for i in range(len(off) - 1)]
+
+class _KDTree:
+    """KD-tree implícito (mediana por nivel) con caja envolvente por nodo para podar."""
+    def __init__(self, pts, leaf_size=16):
+        self.pts, self.leaf = pts, leaf_size
+        self.idx = np.arange(len(pts))
+        nodes, bmin, bmax = [], [], []   # nodos: (lo, hi, izq, der); hojas con izq = -1
+        def build(lo, hi):
+            node = len(nodes); p = self.pts[self.idx[lo:hi]]
+            nodes.append(None); bmin.append(p.min(axis=0)); bmax.append(p.max(axis=0))
+            if hi - lo <= leaf_size:
+                nodes[node] = (lo, hi, -1, -1); return node
+            dim = int(np.argmax(bmax[node] - bmin[node])); mid = (hi - lo) // 2
+            self.idx[lo:hi] = self.idx[lo:hi][np.argpartition(p[:, dim], mid)]
+            left = build(lo, lo + mid); right = build(lo + mid, hi)
+            nodes[node] = (lo, hi, left, right)
+            return node
+        if len(pts): build(0, len(pts))
+        self.nodes = np.array(nodes, dtype=np.int64).reshape(-1, 4)
+        self.bmin = np.array(bmin, dtype=np.float32).reshape(-1, pts.shape[1])
+        self.bmax = np.array(bmax, dtype=np.float32).reshape(-1, pts.shape[1])
+
+    def _ranges(self, nodes):
+        lo, hi = self.nodes[nodes, 0], self.nodes[nodes, 1]
+        if not len(lo): return np.zeros(0, dtype=np.int64)
+        # Concatenación de idx[lo:hi] de varios nodos sin bucle Python
+        n = hi - lo; start = np.repeat(lo - np.cumsum(n) + n, n)
+        return self.idx[start + np.arange(n.sum())]
+
+    def box(self, lo, hi):
+        # Índices de los puntos dentro de la caja [lo, hi] (extremos incluidos); recorre el árbol por
+        # niveles, todos los nodos de un nivel a la vez
+        inside, partial = [], []
+        front = np.zeros(1 if len(self.nodes) else 0, dtype=np.int64)
+        while len(front):
+            bmin, bmax = self.bmin[front], self.bmax[front]
+            front = front[~((bmax < lo).any(axis=1) | (bmin > hi).any(axis=1))]
+            full = ((self.bmin[front] >= lo) & (self.bmax[front] <= hi)).all(axis=1)
+            inside.append(front[full]); front = front[~full]
+            leaf = self.nodes[front, 2] < 0
+            partial.append(front[leaf]); front = self.nodes[front[~leaf]][:, 2:].ravel()
+        ids = self._ranges(np.concatenate(partial)) if partial else np.zeros(0, dtype=np.int64)
+        p = self.pts[ids]
+        return np.concatenate([self._ranges(np.concatenate(inside)) if inside else ids[:0],
+                               ids[((p >= lo) & (p <= hi)).all(axis=1)]])
+
+    def nearest(self, q, k=10, w=None):
+        # k vecinos más cercanos (distancia euclídea con pesos w por dimensión)
+        w = np.ones(self.pts.shape[1], dtype=np.float32) if w is None else np.asarray(w, dtype=np.float32)
+        best, heap = [], [(0.0, 0)] if len(self.nodes) else []   # best: max-heap (-d, id)
+        while heap:
+            d, n = heapq.heappop(heap)
+            if len(best) == k and d > -best[0][0]: break
+            a, b, left, right = self.nodes[n].tolist()
+            if left < 0:
+                ids = self.idx[a:b]
+                for dd, i in zip((((self.pts[ids] - q) * w) ** 2).sum(axis=1).tolist(), ids.tolist()):
+                    if len(best) < k: heapq.heappush(best, (-dd, i))
+                    elif dd < -best[0][0]: heapq.heapreplace(best, (-dd, i))
+                continue
+            for c in (left, right):
+                gap = (np.maximum(self.bmin[c] - q, 0) + np.maximum(q - self.bmax[c], 0)) * w
+                heapq.heappush(heap, (float((gap * gap).sum()), c))
+        return [i for _, i in sorted(((-d, i) for d, i in best))]
+
+class FoodDB:
+    """Alimentos con macros por porción. Se construye desde listas/CSV y se guarda/carga en .npz."""
+    def __init__(self, names, groups, portions, macros):
+        self.names, self.portions = list(names), list(portions)
+        self.groups = list(dict.fromkeys(groups))
+        code = {g: i for i, g in enumerate(self.groups)}
+        self.group = np.array([code[g] for g in groups], dtype=np.uint16)
+        self.macros = np.asarray(macros, dtype=np.float32).reshape(-1, len(MACROS))
+        self.tree = _KDTree(self.macros)
+        # Índice de prefijos: (palabra normalizada, id) ordenado → bisect
+        self._words = sorted((w, i) for i, n in enumerate(self.names) for w in set(tokens(n)))
+        self._keys = [w for w, _ in self._words]
+
+    def __len__(self): return len(self.names)
+
+    def food(self, i):
+        i = int(i)
+        return {"name": self.names[i], "group": self.groups[self.group[i]], "portion": self.portions[i],
+                **{m: float(v) for m, v in zip(MACROS, self.macros[i].tolist())}}
+
+    # ---------- construcción / disco ----------
+    @classmethod
+    def from_records(cls, rows):
+        rows = list(rows)
+        return cls([r["name"] for r in rows], [r["group"] for r in rows], [r.get("portion", "") for r in rows],
+                   [[float(r.get(m) or 0) for m in MACROS] for r in rows])
+
+    @classmethod
+    def from_catalog(cls):
+        # Semilla: cada ejemplo de EXCHANGES vale 1 intercambio de su grupo; SUBS con sus propias macros
+        rows = [{"name": ex, "group": g, "portion": d["portion"], **{m: d[m] for m in MACROS}}
+                for g, d in EXCHANGES.items() for ex in d["examples"]]
+        rows += [{"name": n, "group": g, "portion": d.get("equiv", ""), **{m: d[m] for m in MACROS}}
+                 for g, subs in SUBS.items() for n, d in subs.items()]
+        return cls.from_records(rows)
+
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            return cls.from_records(csv.DictReader(f))
+
+    def save(self, path):
+        names, names_off = _pack(self.names); portions, portions_off = _pack(self.portions)
+        groups, groups_off = _pack(self.groups)
+        np.savez_compressed(path, macros=self.macros, group=self.group, names=names, names_off=names_off,
+                            portions=portions, portions_off=portions_off, groups=groups, groups_off=groups_off)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            groups = _unpack(z["groups"], z["groups_off"])
+            return cls(_unpack(z["names"], z["names_off"]), [groups[c] for c in z["group"].tolist()],
+                       _unpack(z["portions"], z["portions_off"]), z["macros"])
+
+    # ---------- consultas ----------
+    def equivalents(self, group, n_exchanges=1, tol=0.10, limit=None):
+        """Alimentos cuyas macros por porción están a ±tol de n intercambios de `group` (EXCHANGES)."""
+        t = np.array([EXCHANGES[group][m] for m in MACROS], dtype=np.float32) * n_exchanges
+        slack = t * tol + ABS_TOL
+        ids = self.tree.box(t - slack, t + slack)
+        # Más parecidos primero (desviación relativa)
+        d = (np.abs(self.macros[ids] - t) / (t + ABS_TOL)).sum(axis=1)
+        ids = ids[np.argsort(d, kind="stable")][:limit]
+        return [self.food(i) for i in ids]
+
+    def nearest(self, kcal, cho, pro, fat, k=10):
+        # Macros normalizadas por kcal/g para que ninguna dimensión domine
+        return [self.food(i) for i in self.tree.nearest(np.array([kcal, cho, pro, fat], dtype=np.float32), k,
+                                                        w=(1/9, 1/4, 1/4, 1/9))]
+
+    def search(self, text, limit=20):
+        """Alimentos con una palabra que empieza por cada palabra de `text` (sin acentos ni mayúsculas)."""
+        hits = None
+        for q in tokens(text):
+            a = bisect.bisect_left(self._keys, q); b = bisect.bisect_left(self._keys, q + "￿")
+            ids = {i for _, i in self._words[a:b]}
+            hits = ids if hits is None else hits & ids
+            if not hits: return []
+        return [self.food(i) for i in sorted(hits or (), key=lambda i: (len(self.names[i]), self.names[i]))[:limit]]
+
+_DB = None
+
+def food_db(path=FOODS_PATH):
+    # Base por defecto: FOODS_PATH si existe; si no, la semilla del catálogo de intercambios
+    global _DB
+    if _DB is None: _DB = FoodDB.load(path) if os.path.exists(path) else FoodDB.from_catalog()
+    return _DB
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 3 and argv[0] == "build":
+        db = FoodDB.from_csv(argv[1]) if argv[1] != "-" else FoodDB.from_catalog()
+        db.save(argv[2]); print(f"{len(db)} alimentos → {argv[2]} ({os.path.getsize(argv[2]):,} bytes)", file=sys.stderr)
+    elif len(argv) >= 3 and argv[0] in ("equiv", "search"):
+        db = FoodDB.load(argv[1])
+        rows = db.equivalents(argv[2]) if argv[0] == "equiv" else db.search(" ".join(argv[2:]))
+        for r in rows: print(f"{r['name']:<40} {r['group']:<20} {r['kcal']:>6.0f} {r['CHO']:>5.1f} {r['PRO']:>5.1f} {r['FAT']:>5.1f}")
+    else:
+        print("uso: python food_db.py build alimentos.csv|- foods.npz | equiv foods.npz Grupo | search foods.npz texto",
+              file=sys.stderr); return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
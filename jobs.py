@@ -0,0 +1,104 @@
+# jobs.py — Cola de trabajos de exportación compartida por todo el proceso de Streamlit.
+# Un pool acotado (procesos, uno por núcleo) genera los documentos fuera del hilo del script; cada
+# trabajo tiene un id (el hash del contenido: dos sesiones que piden el mismo documento comparten
+# trabajo) y un estado queued → running → done | error. Los resultados caducan a los `ttl` segundos y
+# se conservan como mucho `max_entries` terminados (se descartan los más antiguos), como el LRU anterior.
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import perf
+
+QUEUED, RUNNING, DONE, ERROR = "queued", "running", "done", "error"
+
+def _call(fn, args, kwargs):
+    # Se ejecuta en el worker; los exportadores devuelven BytesIO → bytes. Devuelve también la duración
+    # para que el proceso principal la registre (los spans del worker solo van al JSONL)
+    t0 = time.perf_counter()
+    try:
+        out = fn(*args, **kwargs)
+        if out is None: raise RuntimeError("python-docx no está instalado")
+        return (out.getvalue() if hasattr(out, "getvalue") else out), time.perf_counter() - t0
+    finally:
+        perf.flush(prom=False)
+
+class _Job:
+    __slots__ = ("id", "name", "future", "submitted", "expires", "result", "error")
+
+    def __init__(self, job_id, name, future):
+        self.id, self.name, self.future, self.submitted = job_id, name, future, time.time()
+        self.expires = self.result = self.error = None
+
+class JobQueue:
+    """Pool acotado + registro de trabajos con TTL y tope de resultados. Seguro para usar desde varios
+    hilos (sesiones)."""
+    def __init__(self, workers=None, ttl=900, processes=True, max_entries=64):
+        self.workers, self.ttl, self.max_entries = workers or os.cpu_count() or 1, ttl, max_entries
+        self._jobs, self._lock = {}, threading.Lock()
+        # spawn: el servidor de Streamlit tiene hilos y fork no es seguro
+        self._pool = (ProcessPoolExecutor(self.workers, mp_context=mp.get_context("spawn")) if processes
+                      else ThreadPoolExecutor(self.workers, thread_name_prefix="export"))
+
+    def submit(self, job_id, fn, *args, **kwargs):
+        """Encola fn(*args, **kwargs) bajo job_id; si ya existe (y no falló) se reutiliza."""
+        with self._lock:
+            self._gc()
+            job = self._jobs.get(job_id)
+            if job is not None and job.error is None: return job_id
+            job = _Job(job_id, getattr(fn, "__name__", "job"), self._pool.submit(_call, fn, args, kwargs))
+            self._jobs[job_id] = job
+        job.future.add_done_callback(lambda f, job=job: self._finish(job, f))
+        return job_id
+
+    def _finish(self, job, f):
+        with self._lock:
+            e = f.exception()
+            total = time.time() - job.submitted
+            if e is None:
+                job.result, run = f.result()
+                perf.record(f"job.{job.name}", run); perf.record("job.wait", max(0.0, total - run))
+            else:
+                job.error = f"{type(e).__name__}: {e}"; perf.record(f"job.{job.name}", total, error=True)
+            job.expires = time.time() + self.ttl
+            job.future = None   # sin referencias al pool una vez terminado
+            self._gc()
+
+    def _gc(self):
+        # Caducados por TTL y, por encima de max_entries terminados, los que terminaron antes
+        now = time.time()
+        done = sorted((j.expires, k) for k, j in self._jobs.items() if j.expires is not None)
+        drop = max(0, len(done) - self.max_entries)
+        for i, (exp, k) in enumerate(done):
+            if i < drop or exp < now: del self._jobs[k]
+
+    def status(self, job_id):
+        """queued | running | done | error; None si no existe o ya caducó."""
+        with self._lock:
+            self._gc()
+            job = self._jobs.get(job_id)
+            if job is None: return None
+            if job.expires is not None: return ERROR if job.error else DONE
+            return RUNNING if job.future.running() else QUEUED
+
+    def result(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.result if job is not None else None
+
+    def error(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.error if job is not None else None
+
+    def stats(self):
+        with self._lock:
+            self._gc()
+            out = {QUEUED: 0, RUNNING: 0, DONE: 0, ERROR: 0}
+            for j in self._jobs.values():
+                out[(ERROR if j.error else DONE) if j.expires is not None else (RUNNING if j.future.running() else QUEUED)] += 1
+            return out
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
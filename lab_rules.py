@@ -0,0 +1,138 @@
+# lab_rules.py — Reglas de laboratorio (assessment.biochem de schema_nutri.json) como tabla declarativa,
+# compilada a un evaluador vectorizado: clasifica un DataFrame completo de paneles en ok / warn / bad.
+# Las tarjetas de la app usan el mismo motor con un DataFrame de una fila.
+#
+#   python lab_rules.py paneles.csv seguimiento.csv     # CSV/Parquet/JSONL (registros completos o columnas planas)
+import operator
+import sys
+
+import numpy as np
+import pandas as pd
+
+from clinical_batch import is_male
+
+LEVELS = ("ok", "warn", "bad")
+_OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+# (clave en biochem, etiqueta, unidad, sexo, ok, warn)
+#   sexo: None = ambos, "M" / "F" = solo ese sexo (una fila por sexo si el umbral cambia)
+#   ok / warn: lista de intervalos; cada intervalo es una tupla de comparaciones que deben cumplirse todas.
+#   Un valor que no cae en ok ni en warn es bad; 0 o vacío = sin dato.
+LAB_RULES = [
+    # Glucemia
+    ("glucose_mg_dl", "Glucosa", "mg/dL", None, [(">=70", "<100")], [(">=100", "<126")]),
+    ("hba1c_pct", "HbA1c", "%", None, [("<5.7",)], [(">=5.7", "<6.5")]),
+    ("insulin_uU_ml", "Insulina", "µUI/mL", None, [("<=25",)], []),
+    # Lípidos
+    ("lipids.tc", "Colesterol total", "mg/dL", None, [("<200",)], []),
+    ("lipids.hdl", "HDL", "mg/dL", "M", [(">=40",)], []),
+    ("lipids.hdl", "HDL", "mg/dL", "F", [(">=50",)], []),
+    ("lipids.ldl", "LDL", "mg/dL", None, [("<100",)], []),
+    ("lipids.tg", "Triglicéridos", "mg/dL", None, [("<150",)], []),
+    # Renal (creatinina sérica; albúmina/creatinina en orina, categorías KDIGO A1–A3)
+    ("renal.creat", "Creatinina", "mg/dL", "M", [("<=1.3",)], [(">1.3", "<=1.6")]),
+    ("renal.creat", "Creatinina", "mg/dL", "F", [("<=1.1",)], [(">1.1", "<=1.4")]),
+    ("renal.uacr", "Albúmina/creatinina (orina)", "mg/g", None, [("<30",)], [(">=30", "<300")]),
+    # Hepático (warn hasta 3× el límite superior)
+    ("hepatic.alt", "ALT (TGP)", "U/L", None, [("<=40",)], [(">40", "<=120")]),
+    ("hepatic.ast", "AST (TGO)", "U/L", None, [("<=40",)], [(">40", "<=120")]),
+    # Hierro (anemia leve = warn según OMS; ferritina baja o alta)
+    ("iron.hb", "Hemoglobina", "g/dL", "M", [(">=13",)], [(">=11", "<13")]),
+    ("iron.hb", "Hemoglobina", "g/dL", "F", [(">=12",)], [(">=11", "<12")]),
+    ("iron.ferritin", "Ferritina", "ng/mL", "M", [(">=30", "<=300")], [(">=15", "<30"), (">300", "<=1000")]),
+    ("iron.ferritin", "Ferritina", "ng/mL", "F", [(">=30", "<=200")], [(">=15", "<30"), (">200", "<=1000")]),
+]
+
+def _cond(expr):
+    op = expr[:2] if expr[:2] in _OPS else expr[:1]
+    fn, thr = _OPS[op], float(expr[len(op):])
+    return lambda v: fn(v, thr)
+
+def _intervals(spec):
+    # [(c1, c2), ...] → función vectorizada v → máscara (OR de intervalos, AND dentro de cada uno)
+    parts = [[_cond(c) for c in iv] for iv in spec]
+    def match(v):
+        m = np.zeros(v.shape, dtype=bool)
+        for conds in parts:
+            mi = np.ones(v.shape, dtype=bool)
+            for c in conds: mi &= c(v)
+            m |= mi
+        return m
+    return match
+
+class LabRules:
+    """Tabla de reglas compilada. classify() devuelve un código por regla: 0 ok, 1 warn, 2 bad, -1 sin dato."""
+    def __init__(self, rules=LAB_RULES):
+        self.keys, self.labels, self.units = [], {}, {}
+        self._compiled = []   # (clave, sexo, ok, warn)
+        for key, label, unit, sex, ok, warn in rules:
+            if key not in self.labels: self.keys.append(key)
+            self.labels[key], self.units[key] = label, unit
+            self._compiled.append((key, sex, _intervals(ok), _intervals(warn)))
+
+    def _column(self, df, key):
+        # Acepta la clave tal cual ("lipids.tc"), con prefijo de json_normalize ("assessment.biochem.lipids.tc")
+        # o solo la hoja ("tc")
+        for c in df.columns:
+            if c == key or str(c).endswith("." + key): return df[c]
+        leaf = key.rsplit(".", 1)[-1]
+        return df[leaf] if leaf in df.columns else None
+
+    def codes(self, df, sex=None):
+        """DataFrame (mismo índice) con un código int8 por clave de laboratorio."""
+        n = len(df)
+        if sex is None:
+            sex_col = next((c for c in df.columns if c in ("sex", "sex_at_birth", "sexo") or str(c).endswith(".sex_at_birth")), None)
+            sex = df[sex_col] if sex_col is not None else ""
+        male = np.broadcast_to(is_male(np.asarray(sex, dtype=object)), (n,))
+        out = {}
+        for key, rule_sex, ok, warn in self._compiled:
+            col = self._column(df, key)
+            code = out.setdefault(key, np.full(n, -1, dtype=np.int8))
+            if col is None: continue
+            v = pd.to_numeric(col, errors="coerce").to_numpy(dtype=float)
+            rows = np.isfinite(v) & (v != 0)
+            if rule_sex is not None: rows &= male if rule_sex == "M" else ~male
+            code[rows] = np.where(ok(v[rows]), 0, np.where(warn(v[rows]), 1, 2))
+        return pd.DataFrame(out, index=df.index)
+
+    def classify(self, df, sex=None):
+        # Igual que codes() pero con etiquetas ok/warn/bad (NaN = sin dato)
+        return self.codes(df, sex).apply(lambda c: pd.Categorical.from_codes(c, LEVELS))
+
+    def screen(self, df, sex=None):
+        """Resumen por paciente para seguimiento: nº de bad/warn, peor nivel y claves alteradas."""
+        c = self.codes(df, sex)
+        arr = c.to_numpy()
+        bad, warn = (arr == 2), (arr == 1)
+        keys = np.array(c.columns, dtype=object)
+        flagged = [", ".join(keys[r]) for r in (bad | warn)]
+        worst = pd.Categorical.from_codes(np.where(bad.any(1), 2, np.where(warn.any(1), 1, np.where((arr >= 0).any(1), 0, -1))), LEVELS)
+        return pd.DataFrame({"n_bad": bad.sum(1), "n_warn": warn.sum(1), "worst": worst, "flagged": flagged}, index=df.index)
+
+    def evaluate(self, values, sex):
+        """Un panel (dict clave → valor) → [(clave, etiqueta, unidad, valor, nivel)] solo con los datos presentes."""
+        row = self.classify(pd.DataFrame([values]), sex=[sex]).iloc[0]
+        return [(k, self.labels[k], self.units[k], values[k], row[k]) for k in self.keys
+                if k in values and isinstance(row[k], str)]
+
+RULES = LabRules()
+
+def _read(path):
+    p = path.lower()
+    if p.endswith((".parquet", ".pq")): return pd.read_parquet(path)
+    if p.endswith((".jsonl", ".ndjson")): return pd.json_normalize(pd.read_json(path, lines=True).to_dict("records"))
+    return pd.read_csv(path)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("uso: python lab_rules.py paneles.csv|parquet|jsonl [salida.csv]", file=sys.stderr); return 2
+    df = _read(argv[0])
+    res = RULES.screen(df)
+    print(res["worst"].value_counts(dropna=False).to_string(), file=sys.stderr)
+    if len(argv) > 1: pd.concat([df, res], axis=1)[res["worst"].isin(["warn", "bad"])].to_csv(argv[1], index=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
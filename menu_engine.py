@@ -0,0 +1,103 @@
+# menu_engine.py — Menú de N días (7–30) que cumple las raciones de by_meal con alimentos de food_db.
+# Restricciones: preferences (dislikes, allergies, intolerances, religious) y nutrition_order.exclusions
+# de schema_nutri.json eliminan opciones; likes las adelanta. Variedad: en cada grupo los alimentos
+# permitidos se recorren en ciclo sobre (día, tiempo de comida), así ninguno se repite antes de haber
+# usado todos y nunca dos veces el mismo día si hay opciones suficientes.
+# La búsqueda depende solo de las restricciones y de qué grupos lleva cada comida: se cachea y la
+# comparten todos los pacientes con las mismas (las raciones se aplican después).
+import re
+from functools import lru_cache
+
+from exchanges_catalog import EXCHANGES, MEAL_SPLIT
+from food_db import food_db, fold, tokens
+
+MEALS = tuple(MEAL_SPLIT)
+# Términos de restricción → palabras (prefijos sin acentos) de alimentos o grupos que excluyen
+RESTRICTIONS = {
+    "lactosa": ("leche", "yogur", "queso", "lacteo"),
+    "lacteos": ("leche", "yogur", "queso", "lacteo"),
+    "leche": ("leche", "yogur", "queso", "lacteo"),
+    "gluten": ("pan", "pasta", "trigo", "avena", "cebada", "centeno"),
+    "frutos secos": ("nuez", "nueces", "almendra", "mani", "merey", "pistacho"),
+    "mariscos": ("camaron", "langost", "mejillon", "calamar", "pulpo", "marisco"),
+    "huevo": ("huevo",),
+    "cerdo": ("cerdo", "jamon", "tocino", "chuleta"),
+    "halal": ("cerdo", "jamon", "tocino", "chuleta"),
+    "kosher": ("cerdo", "jamon", "tocino", "chuleta", "camaron", "langost", "mejillon", "calamar", "pulpo", "marisco"),
+    "vegetariano": ("pollo", "pavo", "pescado", "atun", "carne", "res", "cerdo", "jamon", "sardina", "salmon"),
+    "vegano": ("pollo", "pavo", "pescado", "atun", "carne", "res", "cerdo", "jamon", "sardina", "salmon",
+               "leche", "yogur", "queso", "lacteo", "huevo", "miel"),
+}
+MIN_DAYS, MAX_DAYS = 1, 30
+# Palabras de relleno del texto libre ("no le gusta el brócoli" → brocoli); además se ignoran las de < 3 letras
+STOPWORDS = frozenset("sin con los las del por para que muy nada gusta gustan come comer tolera evita evitar "
+                      "alergia alergico alergica intolerancia intolerante prefiere".split())
+
+def _terms(values):
+    # Normaliza las restricciones a prefijos de palabra; "sin gluten", "alergia a la leche" → gluten, leche
+    out = set()
+    for v in values or ():
+        t = re.sub(r"^(sin|no|alergia( a)?( la| el| los| las)?|intolerancia( a)?( la| el)?)\s+", "", fold(v).strip())
+        if not t: continue
+        out.update(RESTRICTIONS.get(t, ()) or (w for w in tokens(t) if len(w) >= 3 and w not in STOPWORDS))
+    return frozenset(out)
+
+def _excluded(name, terms):
+    # Solo el nombre del alimento: un término nunca elimina el grupo entero
+    return any(w.startswith(t) for w in tokens(name) for t in terms)
+
+@lru_cache(maxsize=256)
+def _options(group, terms, likes, db_key):
+    # Alimentos permitidos del grupo; los que coinciden con likes van primero
+    db = food_db()
+    ids = [i for i in range(len(db)) if db.groups[db.group[i]] == group and not _excluded(db.names[i], terms)]
+    return tuple(sorted(ids, key=lambda i: not _excluded(db.names[i], likes)))
+
+@lru_cache(maxsize=256)
+def _schedule(slots, terms, likes, days, db_key):
+    # slots: ((comida, grupo), ...) con raciones > 0. Devuelve {(día, comida, grupo): id | None}
+    out, used = {}, {}
+    for meal, group in slots:
+        opts = _options(group, terms, likes, db_key)
+        used.setdefault(group, []).append((meal, opts))
+    for group, meals in used.items():
+        opts = meals[0][1]
+        for d in range(days):
+            for j, (meal, _) in enumerate(meals):
+                out[(d, meal, group)] = opts[(d*len(meals) + j) % len(opts)] if opts else None
+    return out
+
+def _portion(food, group, servings):
+    # Raciones del plan → porciones del alimento (por kcal; un alimento puede valer 2 intercambios),
+    # redondeadas a ½; menos de ¼ de porción no se lista
+    per = food["kcal"] / EXCHANGES[group]["kcal"] if food["kcal"] and group in EXCHANGES else 1.0
+    n = round(servings / per * 2) / 2
+    if not n: return None
+    return f"{food['name']} ×{n:g}" if n != 1 else food["name"]
+
+def _line(db, plan, d, meal, groups):
+    items = []
+    for g, r in groups:
+        i = plan[(d, meal, g)]
+        items.append(_portion(db.food(i), g, r) if i is not None else f"{g}: sin opción (revisar restricciones)")
+    return "; ".join(x for x in items if x) or "—"
+
+def restrictions(preferences=None, exclusions=()):
+    # preferences / nutrition_order.exclusions de schema_nutri.json → (términos excluidos, términos preferidos)
+    p = preferences or {}
+    terms = _terms([*p.get("dislikes", ()), *p.get("allergies", ()), *p.get("intolerances", ()),
+                    *p.get("religious", ()), *(exclusions or ())])
+    return terms, _terms(p.get("likes", ()))
+
+def menu(by_meal, days=7, preferences=None, exclusions=()):
+    """{comida: {"Día 1": texto, ...}} para `days` días (1–30) a partir de las raciones de by_meal."""
+    days = max(MIN_DAYS, min(MAX_DAYS, int(days)))
+    terms, likes = restrictions(preferences, exclusions)
+    db = food_db()
+    slots = tuple((m, g) for m in MEALS for g, r in by_meal.get(m, {}).items() if r)
+    plan = _schedule(slots, terms, likes, days, id(db))
+    out = {}
+    for m in MEALS:
+        groups = [(g, r) for g, r in by_meal.get(m, {}).items() if r]
+        out[m] = {f"Día {d+1}": _line(db, plan, d, m, groups) for d in range(days)}
+    return out
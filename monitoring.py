@@ -0,0 +1,192 @@
+# monitoring.py — Mediciones de seguimiento (bloque monitoring de schema_nutri.json: peso, cintura, HbA1c,
+# adherencia) en formato columnar por mes:
+#   <dir>/patients.txt            id de paciente por línea (el número de línea es el código)
+#   <dir>/2024-05/weight.f4 ...   una columna binaria sin cabecera por archivo; se añade al final
+# Leer = memmap solo de las columnas pedidas; las tendencias por paciente se calculan vectorizadas.
+#
+#   python monitoring.py import mediciones.csv        # patient_id,date,weight,waist,hba1c,adherence,weight_usual
+#   python monitoring.py trends
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:   # Windows: solo el lock entre hilos del proceso
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+MON_DIR = os.environ.get("NUTRI_MONITORING", "monitoring")
+COLUMNS = {"patient": "i4", "day": "i4", "weight": "f4", "waist": "f4", "hba1c": "f4", "adherence": "f4", "weight_usual": "f4"}
+METRICS = ("weight", "waist", "hba1c", "adherence", "weight_usual")
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+class MonitoringStore:
+    """Escritores serializados entre hilos y procesos (flock sobre <dir>/.lock); los lectores pueden
+    abrir el directorio en cualquier momento."""
+    def __init__(self, path=MON_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._ids_path = os.path.join(path, "patients.txt")
+        self._lock_path = os.path.join(path, ".lock")
+        self.ids, self.codes = [], {}
+        self._load_ids()
+
+    def _load_ids(self):
+        if os.path.exists(self._ids_path):
+            with open(self._ids_path, encoding="utf-8") as f:
+                new = f.read().split("\n")[len(self.ids):-1]
+            for pid in new: self.codes[pid] = len(self.ids); self.ids.append(pid)
+
+    @contextmanager
+    def _writing(self):
+        # Lock del proceso + flock del directorio: la CLI y la app (u otros procesos) no intercalan escrituras
+        with self._lock, open(self._lock_path, "a") as f:
+            if fcntl: fcntl.flock(f, fcntl.LOCK_EX)
+            try: yield
+            finally:
+                if fcntl: fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _code(self, pids):
+        # Códigos de paciente (con _writing tomado); los nuevos se añaden a patients.txt antes que sus
+        # mediciones y el código sale del número de línea releído del archivo, no de un contador local
+        uniq, inv = np.unique(np.asarray(pids, dtype=str), return_inverse=True)
+        self._load_ids()   # otro proceso/instancia pudo añadir pacientes
+        new = [p for p in uniq.tolist() if p not in self.codes]
+        if new:
+            with open(self._ids_path, "a", encoding="utf-8") as f: f.write("".join(p + "\n" for p in new))
+            self._load_ids()
+        return np.array([self.codes[p] for p in uniq.tolist()], dtype=np.int32)[inv]
+
+    def append_frame(self, df):
+        """Añade un DataFrame con patient_id, date y las métricas presentes (las ausentes quedan NaN)."""
+        if not len(df): return 0
+        with self._writing():
+            day = (pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]") - _EPOCH).astype(np.int32)
+            cols = {"patient": self._code(df["patient_id"]), "day": day}
+            for m in METRICS:
+                cols[m] = pd.to_numeric(df[m], errors="coerce").to_numpy(np.float32) if m in df.columns else np.full(len(df), np.nan, np.float32)
+            month = (day.astype("datetime64[D]").astype("datetime64[M]")).astype(str)
+            for mo in np.unique(month):
+                sel = month == mo; part = os.path.join(self.path, mo)
+                os.makedirs(part, exist_ok=True)
+                n = self._rows(part)
+                for c, dt in COLUMNS.items():
+                    # Se recorta cualquier cola de una escritura interrumpida antes de añadir
+                    fn = os.path.join(part, f"{c}.{dt}")
+                    with open(fn, "ab") as f:
+                        f.truncate(n * np.dtype(dt).itemsize); f.write(cols[c][sel].astype(dt).tobytes())
+        return len(df)
+
+    def append(self, rows):
+        return self.append_frame(pd.DataFrame(list(rows)))
+
+    def append_record(self, rec):
+        # Registro de schema_nutri.json (una consulta) → una medición
+        a = rec.get("assessment", {}); an = a.get("anthropometrics", {})
+        mon = rec.get("monitoring", {})
+        return self.append([{"patient_id": rec["patient"]["id"], "date": rec["encounter"]["date"],
+                             "weight": an.get("weight_kg") or None, "waist": an.get("waist_cm") or None,
+                             "hba1c": a.get("biochem", {}).get("hba1c_pct") or None, "adherence": mon.get("adherence"),
+                             "weight_usual": an.get("history", {}).get("weight_usual") or None}])
+
+    def months(self):
+        return sorted(d for d in os.listdir(self.path) if len(d) == 7 and d[4] == "-")
+
+    def stamp(self):
+        # (mes, filas) de cada partición: cambia cada vez que se añaden mediciones
+        return tuple((m, self._rows(os.path.join(self.path, m))) for m in self.months())
+
+    def _rows(self, part):
+        # Filas completas = la columna más corta (protege de escrituras a medias)
+        sizes = [os.path.getsize(os.path.join(part, f"{c}.{dt}")) // np.dtype(dt).itemsize
+                 if os.path.exists(os.path.join(part, f"{c}.{dt}")) else 0 for c, dt in COLUMNS.items()]
+        return min(sizes)
+
+    def scan(self, columns=("patient", "day", "weight"), months=None):
+        """Columnas pedidas (memmap por partición) concatenadas; months = lista "AAAA-MM" o (desde, hasta)."""
+        self._load_ids(); parts = self.months()
+        if isinstance(months, tuple): parts = [m for m in parts if months[0] <= m <= months[1]]
+        elif months is not None: parts = [m for m in parts if m in set(months)]
+        out = {c: [] for c in columns}
+        for mo in parts:
+            part = os.path.join(self.path, mo); n = self._rows(part)
+            if not n: continue
+            for c in columns:
+                out[c].append(np.memmap(os.path.join(part, f"{c}.{COLUMNS[c]}"), dtype=COLUMNS[c], mode="r", shape=(n,)))
+        return {c: np.concatenate(v) if v else np.zeros(0, COLUMNS[c]) for c, v in out.items()}
+
+def _last(values, codes, k):
+    # Último valor no-NaN por paciente (filas ya ordenadas por paciente y fecha)
+    out = np.full(k, np.nan)
+    ok = np.flatnonzero(np.isfinite(values))
+    if len(ok):
+        g = codes[ok]; last = ok[np.r_[g[1:] != g[:-1], True]]
+        out[codes[last]] = values[last]
+    return out
+
+def _slope(x, y, codes, k):
+    # Pendiente de mínimos cuadrados por paciente con sumas agrupadas (bincount); NaN si < 2 puntos
+    ok = np.isfinite(y)
+    c, x, y = codes[ok], x[ok], y[ok].astype(np.float64)
+    n = np.bincount(c, minlength=k).astype(np.float64)
+    sx, sy = np.bincount(c, x, k), np.bincount(c, y, k)
+    sxx, sxy = np.bincount(c, x*x, k), np.bincount(c, x*y, k)
+    den = n*sxx - sx*sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where((n >= 2) & (den > 0), (n*sxy - sx*sy) / den, np.nan)
+
+def trends(data, ids=None):
+    """Tendencias por paciente a partir de scan(): velocidad de peso (kg/semana), % de cambio respecto de
+    weight_usual (o del primer peso si no hay), pendiente de HbA1c (puntos/30 días) y adherencia media."""
+    p, day = data["patient"], data["day"]
+    if not len(p): return pd.DataFrame()
+    order = np.lexsort((day, p)); p, day = p[order], day[order]
+    k = int(p.max()) + 1
+    # Días desde la primera medición de cada paciente (estabilidad numérica de las sumas)
+    start = np.flatnonzero(np.r_[True, p[1:] != p[:-1]]); end = np.r_[start[1:], len(p)] - 1
+    first_day, last_day = np.zeros(k, np.int32), np.zeros(k, np.int32)
+    first_day[p[start]], last_day[p[end]] = day[start], day[end]
+    x = (day - first_day[p]).astype(np.float64)
+    n = np.bincount(p, minlength=k)
+    out = {"n": n, "first": first_day, "last": last_day}
+    if "weight" in data:
+        w = data["weight"][order]
+        out["weight_last"] = _last(w, p, k)
+        out["weight_kg_wk"] = _slope(x, w, p, k) * 7
+        ref = _last(data["weight_usual"][order], p, k) if "weight_usual" in data else np.full(k, np.nan)
+        w_first = _last(w[::-1], p[::-1], k)   # primer peso = último recorriendo al revés
+        ref = np.where(np.isfinite(ref), ref, w_first)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out["pct_change"] = 100 * (out["weight_last"] - ref) / ref
+    if "hba1c" in data:
+        h = data["hba1c"][order]
+        out["hba1c_last"] = _last(h, p, k); out["hba1c_per_30d"] = _slope(x, h, p, k) * 30
+    if "adherence" in data:
+        a = data["adherence"][order].astype(np.float64); ok = np.isfinite(a)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out["adherence_mean"] = np.bincount(p[ok], a[ok], k) / np.bincount(p[ok], minlength=k)
+    df = pd.DataFrame(out)[n > 0]
+    df["first"] = _EPOCH + df["first"].to_numpy().astype("timedelta64[D]")
+    df["last"] = _EPOCH + df["last"].to_numpy().astype("timedelta64[D]")
+    if ids is not None: df.index = pd.Index(np.asarray(ids, dtype=object)[df.index], name="patient_id")
+    return df
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    store = MonitoringStore()
+    if len(argv) == 2 and argv[0] == "import":
+        n = sum(store.append_frame(chunk) for chunk in pd.read_csv(argv[1], chunksize=200_000))
+        print(f"{n} mediciones → {store.path}", file=sys.stderr)
+    elif argv[:1] == ["trends"]:
+        print(trends(store.scan(("patient", "day", "weight", "weight_usual", "hba1c")), store.ids).describe().to_string())
+    else:
+        print("uso: python monitoring.py import mediciones.csv | trends", file=sys.stderr); return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# pages/1_Monitoreo.py — Tablero de cohorte: tendencias de peso y HbA1c desde monitoring.MonitoringStore
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from monitoring import MonitoringStore, trends
+
+BRAND = "@nutritionsays"
+st.set_page_config(page_title=f"{BRAND} · Monitoreo", page_icon="📈", layout="wide")
+
+@st.cache_resource
+def get_monitoring(): return MonitoringStore()
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def cohort(_store, months, stamp):
+    # stamp (filas por mes) invalida la caché cuando llegan mediciones nuevas
+    data = _store.scan(("patient", "day", "weight", "weight_usual", "hba1c", "adherence"), months)
+    return trends(data, _store.ids), np.bincount((data["day"].astype("datetime64[D]").astype("datetime64[M]")
+                                                  - np.datetime64("1970-01", "M")).astype(np.int64)) if len(data["day"]) else np.zeros(0)
+
+store = get_monitoring()
+st.header("Monitoreo de cohorte")
+meses = store.months()
+if not meses:
+    st.info("Aún no hay mediciones. Se registran al guardar consultas o con `python monitoring.py import mediciones.csv`.")
+    st.stop()
+
+desde, hasta = st.select_slider("Meses", options=meses, value=(meses[0], meses[-1])) if len(meses) > 1 else (meses[0], meses[0])
+tr, por_mes = cohort(store, (desde, hasta), store.stamp())
+if tr.empty:
+    st.info("Sin mediciones en el rango elegido."); st.stop()
+
+k = st.columns(4)
+k[0].metric("Pacientes", f"{len(tr):,}")
+k[1].metric("Mediciones", f"{int(tr['n'].sum()):,}")
+k[2].metric("Velocidad de peso (mediana)", f"{tr['weight_kg_wk'].median():+.2f} kg/sem")
+k[3].metric("≥5 % bajo peso usual", f"{(tr['pct_change'] <= -5).mean()*100:.1f} %")
+
+c1, c2 = st.columns(2)
+with c1:
+    st.subheader("Velocidad de peso (kg/semana)")
+    v = tr["weight_kg_wk"].dropna().clip(-2, 2)
+    cnt, edges = np.histogram(v, bins=40, range=(-2, 2))
+    st.bar_chart(pd.DataFrame({"pacientes": cnt}, index=np.round(edges[:-1], 2)))
+with c2:
+    st.subheader("Pendiente de HbA1c (puntos/30 días)")
+    h = tr["hba1c_per_30d"].dropna().clip(-1, 1)
+    cnt, edges = np.histogram(h, bins=40, range=(-1, 1))
+    st.bar_chart(pd.DataFrame({"pacientes": cnt}, index=np.round(edges[:-1], 2)))
+
+st.subheader("Mediciones por mes")
+idx = np.flatnonzero(por_mes)
+st.bar_chart(pd.DataFrame({"mediciones": por_mes[idx]}, index=(np.datetime64("1970-01", "M") + idx).astype(str)))
+
+st.subheader("Prioridad de seguimiento")
+umbral = st.slider("Ganancia de peso ≥ (kg/sem)", 0.0, 1.0, 0.25, 0.05)
+alerta = tr[(tr["weight_kg_wk"] >= umbral) | (tr["hba1c_per_30d"] > 0.1)]
+st.dataframe(alerta.sort_values("weight_kg_wk", ascending=False).head(200), use_container_width=True)
@@ -0,0 +1,143 @@
+# perf.py — Spans de tiempo por sección → histogramas de latencia (panel de depuración, JSONL, Prometheus).
+# Desactivado por defecto: span()/timed()/sections() devuelven objetos vacíos y el coste es prácticamente nulo.
+#
+#   NUTRI_PERF=1                 histogramas en memoria (panel de depuración de la app)
+#   NUTRI_PERF_LOG=perf.jsonl    + una línea JSON por span (se escribe en cada flush())
+#   NUTRI_PERF_PROM=perf.prom    + archivo de texto Prometheus (node_exporter textfile collector) en cada flush()
+#
+#   with perf.span("export.docx"): ...
+#   @perf.timed("calc.macros")
+#   sec = perf.sections("app"); ...; sec("css"); ...; sec("calc"); sec.done()
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+
+LOG_PATH = os.environ.get("NUTRI_PERF_LOG") or None
+PROM_PATH = os.environ.get("NUTRI_PERF_PROM") or None
+ENABLED = os.environ.get("NUTRI_PERF", "") not in ("", "0") or bool(LOG_PATH or PROM_PATH)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SAMPLES = 512   # últimas muestras por span para percentiles exactos en el panel
+
+class Recorder:
+    """Histogramas por nombre (acumulados desde el arranque del proceso). Seguro entre hilos."""
+    def __init__(self, log_path=LOG_PATH, prom_path=PROM_PATH):
+        self.log_path, self.prom_path = log_path, prom_path
+        self._lock = threading.Lock()
+        self.hist, self.samples, self._pending = {}, {}, []
+
+    def record(self, name, seconds, error=False, **attrs):
+        with self._lock:
+            h = self.hist.get(name)
+            if h is None:
+                h = self.hist[name] = {"buckets": [0]*(len(BUCKETS)+1), "sum": 0.0, "count": 0, "errors": 0, "max": 0.0}
+                self.samples[name] = deque(maxlen=SAMPLES)
+            h["buckets"][bisect.bisect_left(BUCKETS, seconds)] += 1
+            h["sum"] += seconds; h["count"] += 1; h["errors"] += bool(error)
+            if seconds > h["max"]: h["max"] = seconds
+            self.samples[name].append(seconds)
+            if self.log_path:
+                self._pending.append({"ts": round(time.time(), 3), "span": name, "ms": round(seconds*1e3, 3),
+                                      "pid": os.getpid(), **({"error": True} if error else {}), **attrs})
+
+    def summary(self):
+        """[{span, n, mean_ms, p50_ms, p95_ms, p99_ms, max_ms, total_s}] ordenado por tiempo total."""
+        with self._lock:
+            items = [(k, dict(h), sorted(self.samples[k])) for k, h in self.hist.items()]
+        q = lambda s, p: s[max(0, math.ceil(p*len(s)) - 1)]*1e3   # rango más cercano
+        out = [{"span": k, "n": h["count"], "mean_ms": round(h["sum"]/h["count"]*1e3, 3), "p50_ms": round(q(s, .5), 3),
+                "p95_ms": round(q(s, .95), 3), "p99_ms": round(q(s, .99), 3), "max_ms": round(h["max"]*1e3, 3),
+                "total_s": round(h["sum"], 4)} for k, h, s in items]
+        return sorted(out, key=lambda r: -r["total_s"])
+
+    def prometheus(self, metric="nutri_span", label="span"):
+        # <metric>_seconds (histograma) y <metric>_errors_total
+        with self._lock:
+            items = sorted((k, dict(h, buckets=list(h["buckets"]))) for k, h in self.hist.items())
+        out = [f"# TYPE {metric}_seconds histogram"]
+        for k, h in items:
+            acc = 0
+            for le, n in zip((*BUCKETS, "+Inf"), h["buckets"]):
+                acc += n; out.append(f'{metric}_seconds_bucket{{{label}="{k}",le="{le}"}} {acc}')
+            out.append(f'{metric}_seconds_sum{{{label}="{k}"}} {h["sum"]:.6f}')
+            out.append(f'{metric}_seconds_count{{{label}="{k}"}} {h["count"]}')
+        out.append(f"# TYPE {metric}_errors_total counter")
+        out += [f'{metric}_errors_total{{{label}="{k}"}} {h["errors"]}' for k, h in items]
+        return "\n".join(out) + "\n"
+
+    def flush(self, prom=True):
+        # JSONL: se añade (varios procesos pueden compartir el archivo); Prometheus: reemplazo atómico
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if pending and self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in pending))
+        if prom and self.prom_path:
+            tmp = f"{self.prom_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f: f.write(self.prometheus())
+            os.replace(tmp, self.prom_path)
+
+    def reset(self):
+        with self._lock: self.hist, self.samples, self._pending = {}, {}, []
+
+RECORDER = Recorder()
+
+class _Span:
+    __slots__ = ("name", "attrs", "t0")
+
+    def __init__(self, name, attrs):
+        self.name, self.attrs = name, attrs
+
+    def __enter__(self):
+        self.t0 = time.perf_counter(); return self
+
+    def __exit__(self, exc_type, exc, tb):
+        RECORDER.record(self.name, time.perf_counter() - self.t0, exc_type is not None, **self.attrs)
+
+class _Sections:
+    # Cada llamada cierra la sección que empezó en la llamada anterior (sin reindentar el script)
+    __slots__ = ("prefix", "t0", "t")
+
+    def __init__(self, prefix):
+        self.prefix, self.t0 = prefix, time.perf_counter(); self.t = self.t0
+
+    def __call__(self, name):
+        now = time.perf_counter()
+        RECORDER.record(f"{self.prefix}.{name}", now - self.t); self.t = now
+
+    def done(self):
+        RECORDER.record(f"{self.prefix}.total", time.perf_counter() - self.t0)
+
+class _NoSections:
+    __slots__ = ()
+    def __call__(self, name): pass
+    def done(self): pass
+
+_NOOP_SPAN, _NOOP_SECTIONS = nullcontext(), _NoSections()
+
+def span(name, **attrs):
+    return _Span(name, attrs) if ENABLED else _NOOP_SPAN
+
+def timed(name):
+    """Decorador; desactivado devuelve la función original (sin envoltorio)."""
+    def deco(fn):
+        if not ENABLED: return fn
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(name, {}): return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def sections(prefix):
+    return _Sections(prefix) if ENABLED else _NOOP_SECTIONS
+
+def record(name, seconds, error=False):
+    if ENABLED: RECORDER.record(name, seconds, error)
+
+def flush(prom=True):
+    if ENABLED: RECORDER.flush(prom)
@@ -0,0 +1,216 @@
+# schema_validator.py — Validador compilado para registros con la estructura de schema_nutri.json.
+# El esquema (un ejemplo anotado: "string", 0.0, "A|B", "YYYY-MM-DD", listas de ejemplo...) se traduce
+# una vez a código Python especializado (una función por objeto anidado, chequeos en línea), de modo
+# que validar un registro no recorre el esquema.
+#
+#   python schema_validator.py registros.jsonl
+import json
+import os
+import re
+import sys
+import time
+from datetime import date
+from functools import lru_cache
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema_nutri.json")
+# Campos sin los cuales un registro no se puede almacenar (ver store.py)
+REQUIRED = (("patient", "id"), ("encounter", "date"))
+
+_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}$")
+# Código de tipo de los elementos de listas (bool no cuenta como número; None no coincide con nada)
+_TYPE_CODE = {str: "s", int: "n", float: "n", bool: "b", dict: "d", list: "l"}
+# Tipos admitidos por clase de hoja en la firma de la vía rápida
+_TYPES = {"bool": (bool,), "num": (int, float), "list": (list,), "obj": (dict,), "any_obj": (dict,)}
+_SIG_MEMO = 1024   # firmas de tipos ya verificadas por objeto
+_NONE = type(None)
+
+@lru_cache(maxsize=4096)
+def _date_ok(s):
+    # YYYY-MM-DD y fecha real (2024-13-99 no); None = campo ausente
+    if s is None: return True
+    if not _DATE_RE.match(s): return False
+    try: date.fromisoformat(s)
+    except ValueError: return False
+    return True
+
+def _sig_checker(allowed, required, strict, memo):
+    # Verifica una firma (claves presentes..., tipos...) y recuerda las válidas. allowed: clave → tipos
+    # admitidos (None incluido salvo en obligatorias); claves desconocidas valen salvo en modo estricto.
+    def check(sig):
+        n = len(sig) // 2
+        seen = dict(zip(sig[:n], sig[n:]))
+        ok = (all(t in allowed[k] if k in allowed else not strict for k, t in seen.items())
+              and all(seen.get(r, _NONE) is not _NONE for r in required))
+        if ok and len(memo) < _SIG_MEMO: memo.add(sig)
+        return ok
+    return check
+
+def _leaf_kind(example):
+    # Tipo de hoja según el valor de ejemplo del esquema
+    if isinstance(example, bool): return ("bool",)
+    if isinstance(example, (int, float)): return ("num",)
+    if example == "YYYY-MM-DD": return ("date",)
+    if isinstance(example, str) and "|" in example: return ("enum", tuple(example.split("|")))
+    return ("str",)
+
+def _list_codes(kind):
+    # Códigos de tipo admitidos en una lista de hojas simples
+    return {"bool": ("b",), "num": ("n",)}.get(kind[0], ("s",))
+
+class _Compiler:
+    def __init__(self, strict, required):
+        self.funcs, self.consts, self.strict = [], {}, strict
+        self.objs, self.paths, self.n = {}, {}, 0
+        self.required = {}
+        # Cada prefijo de un campo obligatorio también lo es: sin "patient" no hay "patient.id"
+        for path in required:
+            for i in range(len(path)): self.required.setdefault(tuple(path[:i]), set()).add(path[i])
+
+    def const(self, value):
+        name = f"_C{len(self.consts)}"; self.consts[name] = value; return name
+
+    def check(self, kind, var, path_expr, ind):
+        # Código que valida `var` (ya distinto de None) y anota el error con la ruta `path_expr`
+        k = kind[0]
+        if k == "bool": cond, msg = f"{var}.__class__ is not bool", "se esperaba booleano"
+        elif k == "num": cond, msg = f"{var}.__class__ not in _NUM", "se esperaba número"
+        elif k == "str": cond, msg = f"{var}.__class__ is not str", "se esperaba texto"
+        elif k == "date": cond, msg = f"{var}.__class__ is not str or not _DATE({var})", "se esperaba fecha YYYY-MM-DD"
+        elif k == "enum":
+            cond = f"{var}.__class__ is not str or {var} not in {self.const(frozenset(kind[1]))}"
+            msg = "valor no permitido (" + "|".join(kind[1]) + ")"
+        elif k == "obj":
+            return [f"{ind}{kind[1]}({var}, {path_expr}, e)"]
+        elif k == "any_obj": cond, msg = f"{var}.__class__ is not dict", "se esperaba objeto"
+        return [f"{ind}if {cond}: e.append(({path_expr}, {msg!r}))"]
+
+    def kind_of(self, example, key_path):
+        if isinstance(example, dict):
+            return ("obj", self.compile_obj(example, key_path)) if example else ("any_obj",)
+        if isinstance(example, list):
+            return ("list", self.kind_of(example[0], key_path + ("[]",)) if example else None)
+        return _leaf_kind(example)
+
+    def compile_obj(self, schema, key_path):
+        name = "_v_" + ("_".join(re.sub(r"\W", "", k) for k in key_path if k != "[]") or "root")
+        kinds = {key: self.kind_of(example, key_path + (key,)) for key, example in schema.items()}
+        self.objs[name] = (schema, kinds); self.paths[name] = key_path
+        req = sorted(self.required.get(key_path, ()))
+        # Vía rápida: el objeto y todos sus descendientes en una sola función sin rutas ni errores
+        # (ver fast_lines); si algo no cuadra se repite con la vía detallada, que sí arma las rutas.
+        self.funcs.append("\n".join([f"def {name}_ok(d):", "    if d.__class__ is not dict: return False",
+                                      *self.fast_lines(name, "d", "    "), "    return True"]))
+        body = [f"def {name}(d, p, e):",
+                f"    if not {name}_ok(d): {name}_slow(d, p, e)",
+                "",
+                f"def {name}_slow(d, p, e):",
+                "    if d.__class__ is not dict:",
+                "        e.append((p, 'se esperaba objeto')); return",
+                "    g = d.get"]
+        for key in req:
+            body.append(f"    if g({key!r}) is None: e.append((p + {'.' + key!r}, 'campo obligatorio'))")
+        for key, kind in kinds.items():
+            path = f"p + {'.' + key!r}"
+            body.append(f"    v = g({key!r})")
+            body.append("    if v is not None:")
+            if kind[0] == "list":
+                body.append("        if v.__class__ is not list: e.append((" + path + ", 'se esperaba lista'))")
+                if kind[1] is not None:
+                    body.append("        else:")
+                    body.append("            for i, x in enumerate(v):")
+                    body.append("                if x is not None:")
+                    body += self.check(kind[1], "x", f"f'{{p}}.{key}[{{i}}]'", " "*20)
+            else:
+                body += self.check(kind, "v", path, " "*8)
+        if self.strict:
+            body.append(f"    for k in d.keys() - {self.const(frozenset(schema))}: e.append((p + '.' + k, 'campo desconocido'))")
+        self.funcs.append("\n".join(body))
+        return name
+
+    def fast_lines(self, name, var, ind):
+        # Firma = claves presentes + sus tipos (map en C), buscada entre las ya verificadas: un registro
+        # parcial no paga por las claves ausentes. Después solo enums/fechas; los objetos hijos presentes
+        # se expanden en línea.
+        schema, kinds = self.objs[name]
+        req = frozenset(self.required.get(self.paths[name], ()))
+        self.n += 1; g, o = f"g{self.n}", f"o{self.n}"
+        allowed = {key: frozenset(_TYPES.get(k[0], (str,)) + (() if key in req else (_NONE,))) for key, k in kinds.items()}
+        memo = set()
+        sigs, chk = self.const(memo), self.const(_sig_checker(allowed, req, self.strict, memo))
+        conds = [f"((s := (*{var}, *map(type, {var}.values()))) in {sigs} or {chk}(s))"]
+        tail = []
+        for key, kind in kinds.items():
+            if kind[0] == "enum": conds.append(f"{g}({key!r}) in {self.const(frozenset(kind[1]) | {None})}")
+            elif kind[0] == "date": conds.append(f"_DATE({g}({key!r}))")
+            elif kind[0] == "obj":
+                tail += [f"{ind}{o} = {g}({key!r})", f"{ind}if {o} is not None:",
+                         *self.fast_lines(kind[1], o, ind + "    ")]
+                self.n += 1; o = f"o{self.n}"
+            elif kind[0] == "list" and kind[1] is not None:
+                if kind[1][0] == "obj":
+                    tail.append(f"{ind}if not all(map({kind[1][1]}_ok, {g}({key!r}) or ())): return False")
+                elif kind[1][0] in ("str", "num", "bool"):
+                    conds.append(f"not set(map(_K, map(type, {g}({key!r}) or ()))) - {self.const(frozenset(_list_codes(kind[1])))}")
+                else:
+                    conds = ["False"]   # listas de enums/fechas: solo vía detallada
+        return [f"{ind}{g} = {var}.get", f"{ind}if not ({' and '.join(conds)}): return False", *tail]
+
+class SchemaValidator:
+    """Valida registros completos (patient, encounter, assessment, ...) de schema_nutri.json.
+
+    Los campos ausentes o null se aceptan salvo los de `required`; con strict=True también se
+    reportan claves que no están en el esquema. Cada error es (ruta, mensaje).
+    """
+    def __init__(self, schema=None, strict=False, required=REQUIRED):
+        if schema is None:
+            with open(SCHEMA_PATH, encoding="utf-8") as f: schema = json.load(f)
+        c = _Compiler(strict, required)
+        root = c.compile_obj(schema, ())
+        self.source = "\n\n".join(c.funcs)
+        ns = {"_NUM": (int, float), "_DATE": _date_ok, "_K": _TYPE_CODE.get, **c.consts}
+        exec(compile(self.source, "<schema_nutri>", "exec"), ns)
+        self._root = ns[root]
+
+    def errors(self, record):
+        e = []; self._root(record, "$", e); return e
+
+    def is_valid(self, record):
+        return not self.errors(record)
+
+    def iter_errors(self, records):
+        """Modo lote: genera (índice, errores) solo para los registros inválidos."""
+        root = self._root
+        for i, r in enumerate(records):
+            e = []; root(r, "$", e)
+            if e: yield i, e
+
+_DEFAULT = None
+
+def validate(record):
+    # Validador por defecto (compilado la primera vez que se usa)
+    global _DEFAULT
+    if _DEFAULT is None: _DEFAULT = SchemaValidator()
+    return _DEFAULT.errors(record)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("uso: python schema_validator.py registros.jsonl [--strict]", file=sys.stderr); return 2
+    v = SchemaValidator(strict="--strict" in argv)
+    n = bad = 0
+    def records(f):
+        # Lectura perezosa: un registro en memoria a la vez (el índice cuenta solo líneas no vacías)
+        nonlocal n
+        for line in f:
+            if line.strip(): n += 1; yield json.loads(line)
+    t0 = time.perf_counter()
+    with open(argv[0], encoding="utf-8") as f:
+        for i, errs in v.iter_errors(records(f)):
+            bad += 1
+            for path, msg in errs: print(f"{i+1}\t{path}\t{msg}")
+    dt = time.perf_counter() - t0
+    print(f"{n} registros · {bad} inválidos · {n/dt if dt else 0:,.0f} registros/s (incluye lectura JSON)", file=sys.stderr)
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# startup_report.py — Informe de arranque en frío de app.py: un intérprete nuevo importa streamlit, ejecuta
+# el primer rerun (AppTest) con NUTRI_PERF=1 y se mide con python -X importtime.
+#   - importaciones hechas durante el primer rerun (paquete de primer nivel → ms acumulados)
+#   - tiempo por sección del rerun (perf.sections: la cabecera y el sidebar se pintan antes de pandas)
+#   - con --modules, costo aislado de importar cada módulo del proyecto después de streamlit
+#
+#   python startup_report.py [--modules] [--json informe.json]
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODULES = ("calc_graph", "clinical_calc", "exchanges_catalog", "exporters", "store", "jobs", "perf",
+           "exchange_solver", "food_db", "menu_engine", "lab_rules", "monitoring", "clinical_batch", "docx", "pandas", "numpy")
+_MARK = "#--- primer rerun ---"
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+_CHILD = f"""
+import sys, time, json
+from streamlit.testing.v1 import AppTest
+print({_MARK!r}, file=sys.stderr, flush=True)
+t0 = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=300).run()
+wall = time.perf_counter() - t0
+import perf
+print(json.dumps({{"first_run_s": wall, "errors": [str(e.value) for e in at.exception],
+                  "sections": {{r["span"]: r["total_s"] for r in perf.RECORDER.summary() if r["span"].startswith("app.")}}}}))
+"""
+
+def _env():
+    return dict(os.environ, NUTRI_PERF="1", NUTRI_PERF_LOG="", NUTRI_PERF_PROM="", PYTHONPATH=HERE)
+
+def _top_level(stderr, after=None):
+    # Líneas de -X importtime sin sangría = importaciones de primer nivel (el acumulado incluye sus dependencias)
+    lines = stderr.splitlines()
+    if after is not None: lines = lines[lines.index(after)+1:] if after in lines else []
+    out = {}
+    for ln in lines:
+        m = _LINE.match(ln)
+        if m and not m.group(3): out[m.group(4)] = out.get(m.group(4), 0) + int(m.group(2)) / 1000
+    return dict(sorted(out.items(), key=lambda kv: -kv[1]))
+
+def first_run():
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", _CHILD], cwd=HERE, env=_env(), capture_output=True, text=True)
+    if p.returncode: raise RuntimeError(p.stderr[-2000:])
+    rep = json.loads(p.stdout.strip().splitlines()[-1])
+    rep["imports_ms"] = _top_level(p.stderr, _MARK)
+    return rep
+
+def module_costs(modules=MODULES):
+    # Cada módulo en un intérprete nuevo tras importar streamlit (lo que añadiría importarlo al arrancar)
+    out = {}
+    for m in modules:
+        p = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import streamlit; print({_MARK!r}, file=__import__('sys').stderr); import {m}"],
+                           cwd=HERE, env=_env(), capture_output=True, text=True)
+        out[m] = round(sum(_top_level(p.stderr, _MARK).values()), 1) if not p.returncode else None
+    return dict(sorted(out.items(), key=lambda kv: -(kv[1] or 0)))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Desglose del arranque en frío de app.py.")
+    ap.add_argument("--modules", action="store_true", help="costo aislado de importar cada módulo")
+    ap.add_argument("--json", default=None)
+    a = ap.parse_args(argv)
+    rep = first_run()
+    print(f"Primer rerun (AppTest, incluye importaciones): {rep['first_run_s']*1e3:,.0f} ms"
+          + (f"  ERRORES: {rep['errors']}" if rep["errors"] else ""))
+    print("\nSecciones (ms):")
+    for k, v in rep["sections"].items(): print(f"  {k:24s} {v*1e3:10.1f}")
+    print("\nImportaciones durante el primer rerun (ms acumulados, primer nivel):")
+    for k, v in list(rep["imports_ms"].items())[:25]: print(f"  {k:24s} {v:10.1f}")
+    if a.modules:
+        rep["modules_ms"] = module_costs()
+        print("\nCosto aislado por módulo tras `import streamlit` (ms):")
+        for k, v in rep["modules_ms"].items(): print(f"  {k:24s} {v if v is not None else 'no instalado':>10}")
+    if a.json:
+        with open(a.json, "w", encoding="utf-8") as f: json.dump(rep, f, indent=2)
+    return 1 if rep["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# store.py — Almacén local (SQLite) de pacientes y consultas con la estructura de schema_nutri.json.
+# Cada consulta guarda el registro completo (encounter, assessment, diagnosis, requirements,
+# exchange_plan, intervention, monitoring) como JSON; las columnas indexadas permiten buscar por
+# paciente, fecha y códigos diagnósticos sin abrir el JSON.
+import json
+import os
+import sqlite3
+import threading
+
+DB_PATH = os.environ.get("NUTRI_DB", "nutri.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    sex_at_birth TEXT,
+    dob TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS encounters (
+    id INTEGER PRIMARY KEY,
+    patient_id TEXT NOT NULL REFERENCES patients(id),
+    date TEXT NOT NULL,
+    type TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS encounter_dx (
+    encounter_id INTEGER NOT NULL REFERENCES encounters(id) ON DELETE CASCADE,
+    code TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_encounters_patient_date ON encounters(patient_id, date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS ix_encounters_date ON encounters(date);
+CREATE INDEX IF NOT EXISTS ix_encounter_dx_code ON encounter_dx(code, encounter_id);
+CREATE INDEX IF NOT EXISTS ix_patients_name ON patients(name);
+"""
+
+_ENCOUNTER_PARTS = ("encounter", "assessment", "diagnosis", "requirements", "exchange_plan", "intervention", "monitoring")
+
+def _dumps(obj): return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def dx_codes(record):
+    # Códigos NCPT del diagnóstico + diagnósticos médicos (assessment.med_history.dx)
+    codes = [c.get("code") for c in record.get("diagnosis", {}).get("ncpt_codes", []) if c.get("code")]
+    codes += record.get("assessment", {}).get("med_history", {}).get("dx", [])
+    return sorted(set(codes))
+
+class NutriStore:
+    """Una conexión por hilo (Streamlit atiende cada sesión en su propio hilo)."""
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self.conn.executescript(_SCHEMA)
+
+    @property
+    def conn(self):
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path)
+            c.execute("PRAGMA journal_mode=WAL"); c.execute("PRAGMA synchronous=NORMAL")
+            c.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = c
+        return c
+
+    def _upsert_patients(self, cur, patients):
+        cur.executemany(
+            "INSERT INTO patients(id, name, sex_at_birth, dob, data) VALUES (?,?,?,?,?) "
+            "ON CONFLICT(id) DO UPDATE SET name=excluded.name, sex_at_birth=excluded.sex_at_birth, "
+            "dob=excluded.dob, data=excluded.data",
+            [(p["id"], p.get("name"), p.get("sex_at_birth"), p.get("dob"), _dumps(p)) for p in patients])
+
+    def _insert_encounters(self, cur, records):
+        ids = []
+        for r in records:
+            enc = r.get("encounter", {})
+            cur.execute("INSERT INTO encounters(patient_id, date, type, data) VALUES (?,?,?,?)",
+                        (r["patient"]["id"], enc["date"], enc.get("type"),
+                         _dumps({k: r[k] for k in _ENCOUNTER_PARTS if k in r})))
+            ids.append(cur.lastrowid)
+        cur.executemany("INSERT INTO encounter_dx(encounter_id, code) VALUES (?,?)",
+                        [(i, c) for i, r in zip(ids, records) for c in dx_codes(r)])
+        return ids
+
+    def save(self, record):
+        """Guarda un registro completo (patient + encounter + ...) y devuelve el id de la consulta."""
+        return self.bulk_insert([record])[0]
+
+    def bulk_insert(self, records, batch_size=5000):
+        """Inserta registros en transacciones de `batch_size`; acepta cualquier iterable."""
+        ids, batch = [], []
+        for r in records:
+            batch.append(r)
+            if len(batch) >= batch_size: ids += self._insert_batch(batch); batch = []
+        if batch: ids += self._insert_batch(batch)
+        return ids
+
+    def _insert_batch(self, batch):
+        with self.conn:   # una transacción por lote
+            cur = self.conn.cursor()
+            self._upsert_patients(cur, {r["patient"]["id"]: r["patient"] for r in batch}.values())
+            return self._insert_encounters(cur, batch)
+
+    def _record(self, patient_json, encounter_json):
+        rec = {"patient": json.loads(patient_json)}; rec.update(json.loads(encounter_json))
+        return rec
+
+    def latest_encounter(self, patient_id):
+        row = self.conn.execute(
+            "SELECT p.data, e.data FROM encounters e JOIN patients p ON p.id = e.patient_id "
+            "WHERE e.patient_id = ? ORDER BY e.date DESC, e.id DESC LIMIT 1", (patient_id,)).fetchone()
+        return self._record(*row) if row else None
+
+    def encounters(self, patient_id, since=None, until=None):
+        q = "SELECT e.date, e.type, e.data FROM encounters e WHERE e.patient_id = ?"
+        args = [patient_id]
+        if since: q += " AND e.date >= ?"; args.append(since)
+        if until: q += " AND e.date <= ?"; args.append(until)
+        return [{"date": d, "type": t, **json.loads(data)}
+                for d, t, data in self.conn.execute(q + " ORDER BY e.date DESC, e.id DESC", args)]
+
+    def patients_with_dx(self, code, since=None):
+        q = ("SELECT DISTINCT e.patient_id FROM encounter_dx x JOIN encounters e ON e.id = x.encounter_id "
+             "WHERE x.code = ?")
+        args = [code]
+        if since: q += " AND e.date >= ?"; args.append(since)
+        return [r[0] for r in self.conn.execute(q, args)]
+
+    def find_patients(self, name_prefix, limit=20):
+        return self.conn.execute("SELECT id, name FROM patients WHERE name >= ? AND name < ? ORDER BY name LIMIT ?",
+                                 (name_prefix, name_prefix + "￿", limit)).fetchall()